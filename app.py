@@ -2,19 +2,28 @@
 
 # 1) Imports
 import streamlit as st
-import importlib.util, sys, json, zipfile
+import importlib.util, os, re, stat, sys, json, zipfile
 from pathlib import Path
 from datetime import datetime
 import shutil
 
+try:
+    import orjson  # optional: faster, writes UTF-8 bytes directly
+except ImportError:
+    orjson = None
+
 # 2) Load the HYBRID engine (safe text + perfect logo + cover/textbox rescue)
-spec = importlib.util.spec_from_file_location(
-    "ndis_cli",
-    str(Path(__file__).parent / "finalHC.py"),
-)
-ndis_cli = importlib.util.module_from_spec(spec)
-sys.modules["ndis_cli"] = ndis_cli
-spec.loader.exec_module(ndis_cli)
+#    Loaded once per process; editing finalHC.py changes its mtime and reloads it
+@st.cache_resource(show_spinner=False)
+def _load_engine(path: str, mtime: float):
+    spec = importlib.util.spec_from_file_location("ndis_cli", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["ndis_cli"] = module
+    spec.loader.exec_module(module)
+    return module
+
+_engine_path = Path(__file__).parent / "finalHC.py"
+ndis_cli = _load_engine(str(_engine_path), _engine_path.stat().st_mtime)
 
 # 3) Page setup
 st.set_page_config(page_title="NDIS Doc Bot — Single Client", page_icon="🗂️", layout="wide")
@@ -23,7 +32,9 @@ st.title("🗂️ NDIS Doc Bot — Single Client (Hybrid)")
 # 4) Sidebar: locations & options
 with st.sidebar:
     st.header("Locations")
-    default_out = (Path.cwd() / "OUTPUT").resolve()
+    # resolve() hits the filesystem, so do it once per session rather than per rerun
+    if 'default_out' not in st.session_state:
+        st.session_state.default_out = str((Path.cwd() / "OUTPUT").resolve())
 
     # Master folder input (local path)
     master_path_input = st.text_input(
@@ -34,7 +45,7 @@ with st.sidebar:
     # Normalize path: remove leading/trailing spaces, expand ~, resolve
     master_path = Path(master_path_input.strip()).expanduser()
     
-    out_root = st.text_input("Output folder", value=str(default_out))
+    out_root = st.text_input("Output folder", value=st.session_state.default_out)
     
     st.header("Logo Settings")
     st.caption("💡 Control logo sizes for different document areas")
@@ -84,92 +95,143 @@ with st.sidebar:
     dry_run = st.checkbox("Dry run (no docs written)", value=False)
 
 # 5) Helpers
+# One "key = value" per line, split on the first "=", both sides trimmed; run over text whose
+# line breaks were normalised to "\n" by splitlines(), so \r, \v, \u2028 etc. still end a line
+_EXTRA_RE = re.compile(r"^[^\S\n]*([^=\n]*?)[^\S\n]*=[^\S\n]*([^\n]*?)[^\S\n]*$", re.MULTILINE)
+
+@st.cache_data(show_spinner=False)
+def _discover_services_cached(path_str: str, mtime: float, size: int) -> tuple:
+    # mtime/size are only part of the cache key so edits to the master invalidate it
+    master = Path(path_str)
+    if master.suffix.lower() == ".zip" and not master.is_dir():
+        top = set()
+        # Read once per (path, mtime, size) thanks to cache_data; the handle is closed right away
+        with zipfile.ZipFile(path_str, "r") as zf:
+            for info in zf.infolist():
+                idx = info.filename.find("/")
+                if idx > 0:
+                    top.add(info.filename[:idx])
+        return tuple(sorted(top))
+    # DirEntry answers is_dir/is_file from the directory listing, no extra stat per child
+    with os.scandir(master) as it:
+        names = [e.name for e in it if e.is_dir(follow_symlinks=False) or e.is_file(follow_symlinks=False)]
+    names.sort()
+    return tuple(names)
+
 def discover_services(master: Path):
-    if not master.exists() or not master.is_dir():
-        return []
-    return sorted([c.name for c in master.iterdir() if c.is_dir() or c.is_file()])
+    # One stat classifies the master and supplies the cache key
+    try:
+        st_master = os.stat(master)
+    except OSError:
+        return ()
+    is_zip = stat.S_ISREG(st_master.st_mode) and master.suffix.lower() == ".zip"
+    if not (stat.S_ISDIR(st_master.st_mode) or is_zip):
+        return ()
+    return _discover_services_cached(str(master), st_master.st_mtime, st_master.st_size)
+
+def _scan_tree(root: str):
+    # Depth-first walk yielding DirEntry objects (cached d_type, no pathlib re-stat)
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                yield entry
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+
+def zip_output_dir(src: Path, dest: Path) -> Path:
+    # Only called right after a run has rewritten src, so the archive is always rebuilt
+    entries = sorted(_scan_tree(str(src)), key=lambda e: e.path)
+    # .docx files are already deflated, so the cheapest level costs almost no size
+    with zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for entry in entries:
+            arcname = os.path.relpath(entry.path, src).replace(os.sep, "/")
+            zf.write(entry.path, arcname=arcname)
+    return dest
 
 def build_data_dict(basics: dict, extras_text: str):
+    # Built once per Generate press; insertion order is what data.json lists
     data = {}
     for k, v in basics.items():
         if v:
             data[k] = v
-    for line in (extras_text or "").splitlines():
-        if "=" in line:
-            key, val = line.split("=", 1)
-            k = key.strip()
-            v = val.strip()
-            if k and v:
-                if not (k.startswith("<") and k.endswith(">")):
-                    k = f"<{k.strip('<>')}>"
-                data[k] = v
+    for m in _EXTRA_RE.finditer("\n".join((extras_text or "").splitlines())):
+        k, v = m.group(1), m.group(2)
+        if k and v:
+            if not (k[:1] == "<" and k[-1:] == ">"):
+                k = f"<{k.strip('<>')}>"
+            data[k] = v
     return data
 
-def title_case_input(label, key):
-    def _to_title():
-        if st.session_state[key]:
-            st.session_state[key] = st.session_state[key].title()
-    return st.text_input(label, key=key, on_change=_to_title)
-
-# 6) Client details
-st.subheader("Client details")
-col1, col2 = st.columns(2)
-with col1:
-    company_name    = title_case_input("<company name>", key="company_name")
-    trading_name    = title_case_input("<trading name>",key="trading name")
-    entity_name     = title_case_input("<entity name>",key="entity name")   
-    abn             = st.text_input("<abn>")
-    acn             = st.text_input("<acn>")          
-with col2:
-    company_email   = st.text_input("<company email>")
-    company_phone   = st.text_input("<company phone>")
-    company_address = st.text_input("<company address>")
-    website         = st.text_input("<website>")      
-    ho              = st.text_input("<ho>")           
-
-st.markdown("**Additional placeholders (optional)** — one per line like `<key>=value`")
-extras_text = st.text_area("Extras", height=140, placeholder="<director name>=Jane Doe\n<year>=2025")
-
-# 7) Logo upload
-logo_file = st.file_uploader("Upload logo (.png/.jpg)", type=["png","jpg","jpeg"])
-
-# 8) Services selection
+# 6) Services available in the master (outside the form: it tracks the sidebar path)
 services_options = discover_services(master_path)
 if not services_options and master_path_input.strip():
     st.warning(f"⚠️ No folders/files found in: {master_path}")
-services = st.multiselect(
-    "Select services (folders/files)",
-    options=services_options,
-    default=services_options
-)
 
-# 9) Output naming
-client_label = st.text_input("Output subfolder name", value=f"CLIENT-{datetime.now().strftime('%Y-%m-%d')}")
+# 7) Client form: edits inside it do not rerun the script until Generate is pressed
+with st.form("client_form"):
+    st.subheader("Client details")
+    col1, col2 = st.columns(2)
+    with col1:
+        company_name    = st.text_input("<company name>", key="company_name")
+        trading_name    = st.text_input("<trading name>", key="trading name")
+        entity_name     = st.text_input("<entity name>", key="entity name")
+        abn             = st.text_input("<abn>")
+        acn             = st.text_input("<acn>")
+    with col2:
+        company_email   = st.text_input("<company email>")
+        company_phone   = st.text_input("<company phone>")
+        company_address = st.text_input("<company address>")
+        website         = st.text_input("<website>")
+        ho              = st.text_input("<ho>")
+
+    st.markdown("**Additional placeholders (optional)** — one per line like `<key>=value`")
+    extras_text = st.text_area("Extras", height=140, placeholder="<director name>=Jane Doe\n<year>=2025")
+
+    # Logo upload
+    logo_file = st.file_uploader("Upload logo (.png/.jpg)", type=["png","jpg","jpeg"])
+
+    # Services selection
+    services = st.multiselect(
+        "Select services (folders/files)",
+        options=services_options,
+        default=services_options
+    )
+
+    # Output naming
+    client_label = st.text_input("Output subfolder name", value=f"CLIENT-{datetime.now().strftime('%Y-%m-%d')}")
 
-st.divider()
+    st.divider()
 
-# Show current settings
-st.info(f"📊 **Current Settings:** Logo size: {st.session_state.logo_width}mm | Dry run: {dry_run}")
+    # Show current settings
+    st.info(f"📊 **Current Settings:** Logo size: {st.session_state.logo_width}mm | Dry run: {dry_run}")
 
-colA, colB = st.columns([1,1])
-go = colA.button("Generate filled documents" if not dry_run else "Preview (Dry run)", type="primary")
-reset = colB.button("Reset form")
+    go = st.form_submit_button("Generate filled documents" if not dry_run else "Preview (Dry run)", type="primary")
+
+# 8) Reset (plain buttons are not allowed inside a form)
+reset = st.button("Reset form")
 
 if reset:
     st.session_state.logo_width = 25.0
     st.rerun()
 
-# 10) Run pipeline
+# 9) Run pipeline
 if go:
     out_root_p = Path(out_root)
     out_client_dir = out_root_p / client_label
     out_root_p.mkdir(parents=True, exist_ok=True)
     workdir = out_root_p / "_ui_work"
-    if workdir.exists():
-        shutil.rmtree(workdir)
     workdir.mkdir(parents=True, exist_ok=True)
+    # Reuse the work dir; only a logo from a previous run (maybe another extension) must go
+    with os.scandir(workdir) as it:
+        for entry in it:
+            if entry.name.startswith("logo.") and entry.is_file(follow_symlinks=False):
+                os.unlink(entry.path)
 
-    # Build data.json
+    # Build data.json (names are title-cased here, once, rather than on every edit)
+    company_name = company_name.title()
+    trading_name = trading_name.title()
+    entity_name = entity_name.title()
     basics = {
         "<company name>":    company_name,
         "<trading name>":    trading_name,
@@ -184,14 +246,19 @@ if go:
     }
     data_dict = build_data_dict(basics, extras_text)
     tmp_data_json = workdir / "data.json"
-    tmp_data_json.write_text(json.dumps(data_dict, indent=2), encoding="utf-8")
+    if orjson is not None:
+        tmp_data_json.write_bytes(orjson.dumps(data_dict, option=orjson.OPT_INDENT_2))
+    else:
+        tmp_data_json.write_text(json.dumps(data_dict, indent=2), encoding="utf-8")
 
     # Save logo
     tmp_logo_path = None
     if logo_file is not None:
         suffix = Path(logo_file.name).suffix.lower() or ".png"
         tmp_logo_path = workdir / f"logo{suffix}"
-        tmp_logo_path.write_bytes(logo_file.read())
+        logo_file.seek(0)
+        with open(tmp_logo_path, "wb") as out:
+            shutil.copyfileobj(logo_file, out, length=1024 * 1024)
 
     services_csv = ",".join(services) if services else ""
 
@@ -212,14 +279,12 @@ if go:
     st.success(f"Done! Logo size used: {current_size}mm")
 
     if report_path.exists():
-        with open(report_path, "rb") as f:
-            st.download_button("Download report CSV", data=f, file_name=report_path.name, mime="text/csv")
+        # Rendered only right after a run has rewritten it, so there is nothing to cache
+        st.download_button("Download report CSV", data=report_path.read_bytes(), file_name=report_path.name, mime="text/csv")
 
     if not dry_run and out_client_dir.exists():
-        out_zip = out_client_dir.with_suffix(".zip")
-        if out_zip.exists():
-            out_zip.unlink()
-        shutil.make_archive(str(out_client_dir), "zip", root_dir=out_client_dir)
+        out_zip = out_client_dir.parent / f"{out_client_dir.name}.zip"
+        zip_output_dir(out_client_dir, out_zip)
         with open(out_zip, "rb") as fz:
             st.download_button("Download filled documents (.zip)", data=fz, file_name=out_zip.name, mime="application/zip")
 
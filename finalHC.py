@@ -6,7 +6,10 @@
 # + Smart context-aware logo sizing for headers and textboxes
 # + FIXED: Proper page breaks for version control tables
 
-import argparse, csv, json, re, shutil, zipfile
+import argparse, copy, csv, functools, io, json, logging, os, re, shutil, zipfile
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
 from pathlib import Path
 from typing import Dict, List, Set, Tuple, Optional
 from docx import Document
@@ -16,27 +19,104 @@ from datetime import datetime
 from docx import Document
 from docx.enum.text import WD_BREAK
 from docx.shared import Pt
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+import docx.oxml
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from lxml import etree
 
 
 PLACEHOLDER_LOGO = "<logo>"
 
+logger = logging.getLogger(__name__)
+
+# python-docx parses every part with one module-level parser, looked up on each parse_xml call.
+# _load_document swaps in one with the same settings minus the xml:id hash table (nothing here
+# looks elements up by id) for the load only; python-docx's own is left untouched otherwise
+_DOCX_OXML_PARSER = docx.oxml.oxml_parser
+_LOAD_PARSER = etree.XMLParser(remove_blank_text=True, resolve_entities=False, collect_ids=False)
+_LOAD_PARSER.set_element_class_lookup(docx.oxml.element_class_lookup)
+
+# Document types that should get cover logos (substring match on the lowercased filename)
+_COVER_LOGO_PATTERNS: Tuple[str, ...] = (
+    "policy and procedure manual",
+    "business plan",
+    "00",  # Matches documents with "00" in filename
+    "policy and procedures",
+    "handbook",
+    "psychological assessment form",
+    "risk assessment guide and checklist",
+    "service agreement and schedule of support",
+    "evaluation of competency",
+)
+
+# Patterns compiled once per process instead of on every run/cell
+_PLACEHOLDER_RE = re.compile(r"<[^<>]+>")
+_LOGO_RE = re.compile(re.escape(PLACEHOLDER_LOGO), re.IGNORECASE)
+_POSSESSIVE_RE = re.compile(r"<company\s+name>\s*\'s\b", re.IGNORECASE)
+_DATE_PATTERNS = (
+    re.compile(r'\d+(?:st|nd|rd|th)\s+of\s+\w+\s+\d{4}', re.IGNORECASE),  # "1st of June 2025"
+    re.compile(r'\w+\s+\d{4}', re.IGNORECASE),  # "June 2025", "May 2025"
+    re.compile(r'\d{4}', re.IGNORECASE),  # Just year "2025"
+)
+_YEAR_FUTURE_RE = re.compile(r'202[6-9]|20[3-9]\d')
+_YEAR_PAST_RE = re.compile(r'202[0-5]')
+_W_P = qn('w:p')
+_W_T = qn('w:t')
+_W_TC = qn('w:tc')
+_W_TR = qn('w:tr')
+_W_TBL = qn('w:tbl')
+_W_R = qn('w:r')
+_W_TAB = qn('w:tab')
+_W_BREAKS = (qn('w:br'), qn('w:cr'))
+# Namespaces for the shape/textbox/image XPaths, and the XPaths themselves, compiled once
+# (smart_strings off: no result should keep a back-reference to its tree)
+_NS = {
+    'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+    'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'pic': 'http://schemas.openxmlformats.org/drawingml/2006/picture',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'v': 'urn:schemas-microsoft-com:vml',
+}
+_XP_DRAWING = etree.XPath('.//w:drawing', namespaces=_NS, smart_strings=False)
+_XP_A_P = etree.XPath('.//a:p', namespaces=_NS, smart_strings=False)
+_XP_A_T = etree.XPath('.//a:t', namespaces=_NS, smart_strings=False)
+_XP_TXBX = etree.XPath('.//w:txbxContent', namespaces=_NS, smart_strings=False)
+# Clark-notation tags of every image-related element, for a descendant walk that stops at the first hit
+_IMAGE_TAGS = tuple(
+    f"{{{_NS[prefix]}}}{name}"
+    for prefix, name in (('w', 'drawing'), ('w', 'pict'), ('v', 'imagedata'), ('a', 'blip'), ('pic', 'pic'), ('w', 'object'))
+)
+_ANCESTOR_TYPES = frozenset({'tc', 'tr', 'tbl', 'sdt', 'txbxContent', 'hdr', 'ftr'})
+
+# Parsed once; callers insert deep copies
+_PAGE_BREAK_XML = f'<w:p {nsdecls("w")}><w:r><w:br w:type="page"/></w:r></w:p>'
+_PAGE_BREAK_TEMPLATE = parse_xml(_PAGE_BREAK_XML)
+_EMPTY_SET: frozenset = frozenset()  # shared "nothing unresolved" result, never mutated
+_HEADER_LOGO_MAX_MM = 20.0  # header/footer logos never exceed this, whatever the cover width
+_VC_KEYWORDS = ("drafted", "version control", "reviewed", "amendment")
+
 # ============================================================================
 # VERSION CONTROL TABLE FUNCTIONS
 # ============================================================================
 
+_MONTHS = (None, "January", "February", "March", "April", "May", "June",
+           "July", "August", "September", "October", "November", "December")
+# Day-of-month -> ordinal suffix; 11th-13th stay "th"
+_ORDINAL = tuple(
+    {1: "st", 2: "nd", 3: "rd", 21: "st", 22: "nd", 23: "rd", 31: "st"}.get(day, "th") for day in range(32)
+)
+
+@functools.lru_cache(maxsize=64)
+def _ordinal_date(year: int, month: int, day: int) -> str:
+    return f"{day}{_ORDINAL[day]} of {_MONTHS[month]} {year}"
+
 def get_ordinal_date(date_obj: datetime) -> str:
     """Convert datetime to ordinal format like '14th of August 2025'"""
-    day = date_obj.day
-    month = date_obj.strftime("%B")  # Full month name
-    year = date_obj.year
-    
-    # Add ordinal suffix
-    if 10 <= day <= 20:
-        suffix = "th"
-    else:
-        suffix = {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
-    
-    return f"{day}{suffix} of {month} {year}"
+    # English month names from a table: no strftime/locale lookup
+    return _ordinal_date(date_obj.year, date_obj.month, date_obj.day)
 
 def get_version_control_dates() -> Tuple[str, str]:
     """Get current date and next year date in ordinal format"""
@@ -48,100 +128,127 @@ def get_version_control_dates() -> Tuple[str, str]:
     
     return current_date, next_review_date
 
-def find_and_update_version_control_table(doc: Document) -> bool:
+def _paragraph_run_text(p_elm) -> str:
+    """Paragraph.text straight off the tree: w:t text, tabs and breaks of the paragraph's own runs only"""
+    parts = []
+    for r in p_elm.iterchildren(_W_R):
+        for child in r:
+            tag = child.tag
+            if tag == _W_T:
+                parts.append(child.text or "")
+            elif tag == _W_TAB:
+                parts.append("\t")
+            elif tag in _W_BREAKS:
+                parts.append("\n")
+    return "".join(parts)
+
+def _find_version_control_table(body_elm):
+    """First top-level <w:tbl> (what doc.tables lists) with a cell paragraph mentioning a version control keyword"""
+    # Same text as cell.paragraphs[i].text, so field codes, deletions and textboxes never count;
+    # no Table/_Cell/Paragraph proxies are built on the way
+    for tbl in body_elm.iterchildren(_W_TBL):
+        for tr in tbl.iterchildren(_W_TR):
+            for tc in tr.iterchildren(_W_TC):
+                for p in tc.iterchildren(_W_P):
+                    text = _paragraph_run_text(p).lower()
+                    if any(kw in text for kw in _VC_KEYWORDS):
+                        return tbl
+    return None
+
+def _locate_version_control(doc: Document):
+    """Single pass over the body for the version control heading and the version control table"""
+    paras = list(doc.paragraphs)
+    heading_index = -1
+    for i, para in enumerate(paras):
+        text = para.text.strip().lower()
+        if "version control" in text and "table" in text:
+            heading_index = i
+            break
+    # Only the matching <w:tbl> is wrapped as a Table
+    tbl = _find_version_control_table(doc.element.body)
+    table = Table(tbl, doc._body) if tbl is not None else None
+    return paras, heading_index, table
+
+def _is_blank_paragraph(elem) -> bool:
+    """True for a <w:p> whose text is empty or whitespace"""
+    return elem.tag == _W_P and not "".join(t.text or "" for t in elem.iter(_W_T)).strip()
+
+def _replace_date_in_runs(paragraph, pattern, new_date: str) -> bool:
+    """Substitute the date inside each run; if it straddles runs, merge the paragraph text into the first run"""
+    runs = paragraph.runs
+    changed = False
+    for run in runs:
+        new_text, n = pattern.subn(new_date, run.text)
+        if n:
+            run.text = new_text
+            changed = True
+    if not changed and len(runs) > 1:
+        new_text, n = pattern.subn(new_date, "".join(r.text for r in runs))
+        if n:
+            runs[0].text = new_text
+            for run in runs[1:]:
+                run.text = ""
+            changed = True
+    return changed
+
+def find_and_update_version_control_table(doc: Document, located: Optional[tuple] = None) -> bool:
     """Find existing version control table and update dates in place while preserving formatting"""
     try:
         current_date, next_review_date = get_version_control_dates()
-        print(f"Looking for version control table to update with dates: Current = {current_date}, Next Review = {next_review_date}")
+        logger.debug("Looking for version control table to update with dates: Current = %s, Next Review = %s", current_date, next_review_date)
         
-        # Look for tables that contain version control data
-        for table in doc.tables:
-            if table.rows:
-                # Check all text in the table to see if it's version control related
-                table_text = ""
-                for row in table.rows:
-                    for cell in row.cells:
-                        table_text += cell.text.lower() + " "
+        # Look for the table that contains version control data
+        _paras, _heading_index, table = located if located is not None else _locate_version_control(doc)
+        if table is None:
+            logger.debug("No version control table found")
+            return False
+        
+        logger.debug("Found version control table, updating dates...")
+        
+        # Update dates in the table while preserving formatting
+        seen_cells = set()
+        for row in table.rows:
+            for cell in row.cells:
+                # Merged cells come back once per grid column; update each real cell once,
+                # otherwise the freshly written date is matched again as a future year
+                if cell._tc in seen_cells:
+                    continue
+                seen_cells.add(cell._tc)
                 
-                # If this looks like a version control table
-                if any(keyword in table_text for keyword in ["drafted", "version control", "reviewed", "amendment"]):
-                    print(f"Found version control table, updating dates...")
-                    
-                    # Update dates in the table while preserving formatting
-                    for row in table.rows:
-                        for cell in row.cells:
-                            text = cell.text
-                            
-                            if not text.strip():
-                                continue
-                            
-                            # Look for date patterns and replace them
-                            date_patterns = [
-                                r'\d+(?:st|nd|rd|th)\s+of\s+\w+\s+\d{4}',  # "1st of June 2025"
-                                r'\w+\s+\d{4}',  # "June 2025", "May 2025"
-                                r'\d{4}'  # Just year "2025"
-                            ]
-                            
-                            updated = False
-                            new_text = text
-                            
-                            for pattern in date_patterns:
-                                if re.search(pattern, text, re.IGNORECASE):
-                                    # Check if this might be next review (look for 2026 or higher year)
-                                    if re.search(r'202[6-9]|20[3-9]\d', text):
-                                        # This is likely next review date
-                                        new_text = re.sub(pattern, next_review_date, text, flags=re.IGNORECASE)
-                                        print(f"Updated next review date: '{text}' -> '{new_text}'")
-                                        updated = True
-                                    elif re.search(r'202[0-5]', text):
-                                        # This is likely current date
-                                        new_text = re.sub(pattern, current_date, text, flags=re.IGNORECASE)
-                                        print(f"Updated current date: '{text}' -> '{new_text}'")
-                                        updated = True
-                                    break
-                            
-                            # If we updated the text, preserve formatting while updating
-                            if updated:
-                                # Store formatting from the first run
-                                original_formatting = {}
-                                if cell.paragraphs and cell.paragraphs[0].runs:
-                                    first_run = cell.paragraphs[0].runs[0]
-                                    original_formatting = {
-                                        'font_name': first_run.font.name,
-                                        'font_size': first_run.font.size,
-                                        'is_bold': first_run.font.bold,
-                                        'is_italic': first_run.font.italic,
-                                        'font_color': first_run.font.color.rgb if first_run.font.color else None
-                                    }
-                                
-                                # Update the cell text
-                                cell.text = new_text
-                                
-                                # Restore formatting to the new text
-                                try:
-                                    if cell.paragraphs and cell.paragraphs[0].runs:
-                                        for run in cell.paragraphs[0].runs:
-                                            if original_formatting.get('font_name'):
-                                                run.font.name = original_formatting['font_name']
-                                            if original_formatting.get('font_size'):
-                                                run.font.size = original_formatting['font_size']
-                                            if original_formatting.get('is_bold') is not None:
-                                                run.font.bold = original_formatting['is_bold']
-                                            if original_formatting.get('is_italic') is not None:
-                                                run.font.italic = original_formatting['is_italic']
-                                            if original_formatting.get('font_color'):
-                                                run.font.color.rgb = original_formatting['font_color']
-                                        print(f"Preserved formatting: font={original_formatting.get('font_name')}, bold={original_formatting.get('is_bold')}")
-                                except Exception as fmt_error:
-                                    print(f"Warning: Could not fully preserve formatting: {fmt_error}")
-                    
-                    return True
+                # One read of the cell's paragraphs serves the test, the update and the log
+                cell_paras = cell.paragraphs
+                text = "\n".join(para.text for para in cell_paras)
+                
+                if not text.strip():
+                    continue
+                
+                # The year in the cell decides which date goes in (any year also matches \d{4})
+                if _YEAR_FUTURE_RE.search(text):
+                    # This is likely next review date
+                    new_date = next_review_date
+                elif _YEAR_PAST_RE.search(text):
+                    # This is likely current date
+                    new_date = current_date
+                else:
+                    continue
+                
+                # Most specific date pattern first; subn both finds and replaces, so the
+                # first pattern that rewrites anything wins. Runs are rewritten in place
+                # so every run keeps its own formatting
+                for pattern in _DATE_PATTERNS:
+                    updated = False
+                    for para in cell_paras:
+                        if _replace_date_in_runs(para, pattern, new_date):
+                            updated = True
+                    if updated:
+                        new_text = "\n".join(para.text for para in cell_paras)
+                        logger.debug("Updated date: %r -> %r", text, new_text)
+                        break
         
-        print("No version control table found")
-        return False
+        return True
         
     except Exception as e:
-        print(f"Error updating version control table: {e}")
+        logger.warning("Error updating version control table: %s", e)
         return False
 
 # def move_version_control_to_own_page(doc: Document) -> bool:
@@ -201,50 +308,45 @@ def find_and_update_version_control_table(doc: Document) -> bool:
 
 
 
-def move_version_control_to_own_page(doc: Document) -> bool:
+def move_version_control_to_own_page(doc: Document, located: Optional[tuple] = None) -> bool:
     """
     Ensure Version Control heading and its table stay together on one page,
     remove blank paragraphs, and avoid page breaks.
     """
     try:
-        # Find heading
-        version_heading_index = -1
-        for i, para in enumerate(doc.paragraphs):
-            if "version control" in para.text.strip().lower() and "table" in para.text.strip().lower():
-                version_heading_index = i
-                break
+        # Heading position comes from the shared locate pass (one doc.paragraphs read)
+        paras, version_heading_index, _table = located if located is not None else _locate_version_control(doc)
 
         if version_heading_index == -1:
-            print("No version control heading found")
+            logger.debug("No version control heading found")
             return False
 
-        heading_para = doc.paragraphs[version_heading_index]
-
-        # Remove empty paragraphs and page breaks immediately after heading
-        next_index = version_heading_index + 1
-        while next_index < len(doc.paragraphs) and not doc.paragraphs[next_index].text.strip():
-            p = doc.paragraphs[next_index]
-            p._element.getparent().remove(p._element)
-
-        # Remove empty paragraphs before heading
-        prev_index = version_heading_index - 1
-        while prev_index >= 0 and not doc.paragraphs[prev_index].text.strip():
-            p = doc.paragraphs[prev_index]
-            p._element.getparent().remove(p._element)
-            prev_index -= 1
+        heading_para = paras[version_heading_index]
+
+        # Remove empty paragraphs and page breaks immediately after heading, then
+        # before it: plain lxml sibling steps, stopping at the first non-blank
+        # paragraph or at any table/section element
+        heading_elm = heading_para._element
+        for forward in (True, False):
+            elem = heading_elm.getnext() if forward else heading_elm.getprevious()
+            while elem is not None and _is_blank_paragraph(elem):
+                nxt = elem.getnext() if forward else elem.getprevious()
+                elem.getparent().remove(elem)
+                elem = nxt
         # Set keep_with_next for heading
         # Set heading spacing
         heading_para.paragraph_format.space_before = Pt(0)  # remove space before
         heading_para.paragraph_format.space_after = Pt(6)  # small space after
         heading_para.paragraph_format.keep_with_next = True
 
-        # Find the table that comes after the heading
+        # Find the table that comes after the heading: index the body once and
+        # compare positions instead of searching the paragraph list per table
+        body = heading_para._element.getparent()
+        body_index = {el: i for i, el in enumerate(body)}
+        heading_pos = body_index[heading_para._element]
         version_table = None
         for table in doc.tables:
-            # Compare table start index to heading index
-            first_cell = table.cell(0,0)
-            cell_para_index = doc.paragraphs.index(first_cell.paragraph)
-            if cell_para_index > version_heading_index:
+            if body_index.get(table._tbl, -1) > heading_pos:
                 version_table = table
                 break
 
@@ -257,132 +359,11 @@ def move_version_control_to_own_page(doc: Document) -> bool:
                         cell_paras[0].paragraph_format.keep_with_next = True
                 break  # only first row
 
-        print("Version Control heading and table will stay together")
+        logger.debug("Version Control heading and table will stay together")
         return True
 
     except Exception as e:
-        print(f"Error processing Version Control: {e}")
-        return False
-
-  
-
-
-
-
-        
-        # METHOD 2: If no heading found, insert page break before version control table
-        if version_table_element is not None:
-            try:
-                # Find the paragraph that contains or precedes this table
-                parent = version_table_element.getparent()
-                
-                # Create a new paragraph element with page break
-                from docx.oxml import parse_xml
-                from docx.oxml.ns import nsdecls, qn
-                
-                # Create a paragraph with a page break
-                page_break_xml = f'''
-                <w:p {nsdecls('w')}>
-                    <w:r>
-                        <w:br w:type="page"/>
-                    </w:r>
-                </w:p>
-                '''
-                
-                page_break_element = parse_xml(page_break_xml)
-                
-                # Insert the page break before the table
-                parent.insert(parent.index(version_table_element), page_break_element)
-                
-                print("Successfully inserted page break before version control table")
-                return True
-                
-            except Exception as table_error:
-                print(f"Could not insert page break before table: {table_error}")
-        
-        #METHOD 3: Fallback - find any content with "version control" and add page break
-        try:
-            # Look through all paragraphs for version control content
-            for i, paragraph in enumerate(doc.paragraphs):
-                if "version control" in paragraph.text.lower():
-                    # Insert page break before this paragraph
-                    new_para = paragraph.insert_paragraph_before()
-                    run = new_para.add_run()
-                    run.add_break(WD_BREAK.PAGE)
-                    print(f"Fallback: Inserted page break before paragraph {i}")
-                    return True
-        except Exception as fallback_error:
-            print(f"Fallback method failed: {fallback_error}")
-        
-        # METHOD 4: Ultra-fallback using line breaks with enhanced calculation
-        try:
-            print("Using enhanced line break method as ultra-fallback...")
-            
-            # Calculate position more accurately
-            content_before_vc = 0
-            
-            # Count all content before version control (paragraphs, tables, etc.)
-            found_vc = False
-            for i, paragraph in enumerate(doc.paragraphs):
-                if "version control" in paragraph.text.lower():
-                    content_before_vc = i
-                    found_vc = True
-                    break
-            
-            if not found_vc and version_heading_index >= 0:
-                content_before_vc = version_heading_index
-            
-            # Count tables before version control position
-            tables_before = 0
-            for table in doc.tables:
-                # Rough heuristic: if table appears early in document, count it
-                table_text = ""
-                for row in table.rows:
-                    for cell in row.cells:
-                        table_text += cell.text.lower() + " "
-                
-                # If this is NOT the version control table and appears before it
-                if not any(keyword in table_text for keyword in ["drafted", "version control", "reviewed", "amendment"]):
-                    tables_before += 1
-            
-            # Enhanced line break calculation
-            # Base breaks needed
-            base_breaks = 0 #MADE 10 BY KAVITA
-            
-            # Add more breaks for tables (tables take up more space)
-            table_adjustment = tables_before * 6  # Each table needs ~8 additional breaks
-            
-            # Add breaks based on content position
-            position_adjustment = max(0, 20 - content_before_vc)  # More breaks if VC appears early
-            
-            total_breaks = base_breaks + table_adjustment + position_adjustment
-            
-            # Cap at reasonable maximum
-            total_breaks = min(total_breaks, 50)
-            
-            print(f"Break calculation: base={base_breaks}, tables={tables_before}*8={table_adjustment}, position={position_adjustment}, total={total_breaks}")
-            
-            # Find insertion point
-            if version_heading_index > 0:
-                insert_point = doc.paragraphs[version_heading_index - 1]
-            elif len(doc.paragraphs) > 0:
-                insert_point = doc.paragraphs[-1]
-            else:
-                insert_point = doc.add_paragraph()
-            
-            # Add the calculated number of line breaks
-            # for _ in range(total_breaks):
-            #     insert_point.add_run().add_break()
-            
-            print(f"Enhanced fallback: Added {total_breaks} line breaks")
-            return True
-            
-        except Exception as ultra_fallback_error:
-            print(f"Ultra-fallback failed: {ultra_fallback_error}")
-            return False
-        
-    except Exception as e:
-        print(f"Error moving version control to own page: {e}")
+        logger.warning("Error processing Version Control: %s", e)
         return False
 
 def insert_page_break_before_element(element, doc: Document) -> bool:
@@ -395,173 +376,185 @@ def insert_page_break_before_element(element, doc: Document) -> bool:
         if parent is None:
             return False
         
-        # Create page break XML
-        from docx.oxml import parse_xml
-        from docx.oxml.ns import nsdecls
-        
-        page_break_xml = f'''
-        <w:p {nsdecls('w')}>
-            <w:r>
-                <w:br w:type="page"/>
-            </w:r>
-        </w:p>
-        '''
-        
-        page_break_element = parse_xml(page_break_xml)
+        # Copy the pre-parsed page break paragraph
+        page_break_element = copy.deepcopy(_PAGE_BREAK_TEMPLATE)
         
         # Insert before the target element
-        element_index = list(parent).index(element)
-        parent.insert(element_index, page_break_element)
+        parent.insert(parent.index(element), page_break_element)
         
         return True
         
     except Exception as e:
-        print(f"Failed to insert page break: {e}")
+        logger.warning("Failed to insert page break: %s", e)
         return False
 
 def process_version_control_table(doc: Document) -> bool:
     """Main function to handle version control table processing"""
     try:
+        # Locate heading and table once; both steps work from the same references
+        located = _locate_version_control(doc)
+        
         # Step 1: Update dates in existing table
-        updated = find_and_update_version_control_table(doc)
+        updated = find_and_update_version_control_table(doc, located)
         
         # Step 2: Move to own page using proper page breaks
-        moved = move_version_control_to_own_page(doc)
+        moved = move_version_control_to_own_page(doc, located)
         
         return updated or moved
         
     except Exception as e:
-        print(f"Error processing version control table: {e}")
+        logger.warning("Error processing version control table: %s", e)
         return False
 
 # ============================================================================
 # COVER PAGE FUNCTIONS
 # ============================================================================
 
-def add_cover_page_logo_large(doc: Document, logo: Optional[Path] = None, width_mm: float = 40.0) -> bool:
+def _logo_source(logo: Path, logo_bytes: Optional[bytes] = None):
+    """What add_picture reads: a fresh stream over the already-loaded bytes, else the file path"""
+    return io.BytesIO(logo_bytes) if logo_bytes is not None else str(logo)
+
+def add_cover_page_logo_large(doc: Document, logo: Optional[Path] = None, width_mm: float = 40.0, logo_bytes: Optional[bytes] = None) -> bool:
     """
     Add cover page logo positioned below banner but above Contents - DEBUGGING VERSION
     """
     if not logo or not logo.exists():
-        print(f"Cover logo failed: Logo file missing or doesn't exist")
-        print(f"Logo path: {logo}")
-        print(f"Logo exists: {logo.exists() if logo else 'No logo provided'}")
+        logger.warning("Cover logo failed: Logo file missing or doesn't exist")
+        logger.debug("Logo path: %s", logo)
+        logger.debug("Logo exists: %s", logo.exists() if logo else 'No logo provided')
         return False
     
-    print(f"ATTEMPTING to insert cover logo at {width_mm}mm...")
-    print(f"Logo file: {logo}")
-    print(f"Logo size: {logo.stat().st_size} bytes")
-    print(f"Document has {len(doc.paragraphs)} paragraphs")
+    logger.debug("ATTEMPTING to insert cover logo at %smm...", width_mm)
+    logger.debug("Logo file: %s", logo)
+    logger.debug("Logo size: %s bytes", len(logo_bytes) if logo_bytes is not None else logo.stat().st_size)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        # doc.paragraphs builds a proxy per paragraph; only pay for it when it is logged
+        logger.debug("Document has %s paragraphs", len(doc.paragraphs))
     
     try:
         # METHOD 1: Insert at very beginning with detailed tracking
-        print(f"Creating new paragraph for cover logo...")
+        logger.debug("Creating new paragraph for cover logo...")
         
         # Create paragraph FIRST
         new_p = doc.add_paragraph()
-        print(f"New paragraph created")
+        logger.debug("New paragraph created")
         
         # Set alignment BEFORE moving
         new_p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        print(f"Alignment set to LEFT")
+        logger.debug("Alignment set to LEFT")
         
         # Add spacing BEFORE moving
         paragraph_format = new_p.paragraph_format
         paragraph_format.space_before = Mm(15)  # Reduced spacing
         paragraph_format.space_after = Mm(3)
-        print(f"Spacing set: before={15}mm, after={3}mm")
+        logger.debug("Spacing set: before=15mm, after=3mm")
         
         # Add logo BEFORE moving paragraph
-        print(f"Adding logo to paragraph...")
+        logger.debug("Adding logo to paragraph...")
         run = new_p.add_run()
-        run.add_picture(str(logo), width=Mm(width_mm))
-        print(f"Logo added to run with width {width_mm}mm")
+        run.add_picture(_logo_source(logo, logo_bytes), width=Mm(width_mm))
+        logger.debug("Logo added to run with width %smm", width_mm)
         
         # Add line break after logo (no debug text)
         #run.add_break()
-        print(f"Line break added after logo")
+        logger.debug("Line break added after logo")
         
         # NOW move to beginning
-        print(f"Moving paragraph to beginning...")
+        logger.debug("Moving paragraph to beginning...")
         new_p_element = new_p._element
         parent = new_p_element.getparent()
         parent.remove(new_p_element)
         parent.insert(0, new_p_element)
-        print(f"Paragraph moved to position 0")
+        logger.debug("Paragraph moved to position 0")
         
         # Verify placement
-        print(f"Document now has {len(doc.paragraphs)} paragraphs")
-        if doc.paragraphs:
-            first_para_text = doc.paragraphs[0].text
-            print(f"First paragraph text: '{first_para_text[:100]}...'")
+        if debug:
+            paragraphs = doc.paragraphs
+            logger.debug("Document now has %s paragraphs", len(paragraphs))
+            if paragraphs:
+                logger.debug("First paragraph text: '%s...'", paragraphs[0].text[:100])
         
-        print(f"COVER LOGO INSERTION COMPLETED SUCCESSFULLY")
+        logger.debug("COVER LOGO INSERTION COMPLETED SUCCESSFULLY")
         return True
         
     except Exception as e:
-        print(f"Cover logo insertion failed with error: {e}")
-        import traceback
-        print(f"Full traceback:")
-        traceback.print_exc()
+        logger.warning("Cover logo insertion failed with error: %s", e, exc_info=True)
         return False
 
+@functools.lru_cache(maxsize=None)
+def _is_policy_filename(filename_lower: str) -> bool:
+    matched = next((pattern for pattern in _COVER_LOGO_PATTERNS if pattern in filename_lower), None)
+    logger.debug("Cover logo check: %r matched %r", filename_lower, matched)
+    return matched is not None
+
 def is_policy_manual(doc_path: Path) -> bool:
     """
     Check if document should receive a cover logo based on filename patterns
     """
-    filename_lower = doc_path.name.lower()
-    
-    # List of document types that should get cover logos
-    cover_logo_patterns = [
-        "policy and procedure manual",
-        "business plan",
-        "00",  # Matches documents with "00" in filename
-        "policy and procedures",
-        "handbook",
-        "psychological assessment form",
-        "risk assessment guide and checklist",
-        "service agreement and schedule of support",
-        "evaluation of competency"
-    ]
-    
-    # Check if any pattern matches
-    for pattern in cover_logo_patterns:
-        if pattern in filename_lower:
-            print(f"Cover logo check: '{filename_lower}' contains '{pattern}': True")
-            return True
-    
-    print(f"Cover logo check: '{filename_lower}' - no matching patterns found: False")
-    return False
+    # Only the lowercased file name matters, so that is the cache key
+    return _is_policy_filename(doc_path.name.lower())
 
 # ============================================================================
 # CORE REPLACEMENT FUNCTIONS
 # ============================================================================
 
+@functools.lru_cache(maxsize=4)
+def _parse_replacements(raw: bytes) -> Dict[str, str]:
+    data = json.loads(raw.decode("utf-8"))
+    return {str(k): ("" if v is None else str(v)) for k, v in data.items()}
+
 def load_replacements(p: Path) -> Dict[str, str]:
-    data = json.loads(p.read_text(encoding="utf-8"))
-    norm = {}
-    for k, v in data.items():
-        k = str(k)
-        norm[k] = "" if v is None else str(v)
-        norm[k.lower()] = "" if v is None else str(v)
-    return norm
+    # Canonical keys only; case-insensitive lookups go through _ci_get / the master pattern.
+    # Keyed on the file's bytes, not its path: the app rewrites the same data.json for
+    # every client. Callers get their own copy to mutate.
+    return dict(_parse_replacements(p.read_bytes()))
+
+def _ci_get(repl: Dict[str, str], key: str, default=None):
+    """Case-insensitive repl lookup: exact key, then lowercase key, then a scan for other spellings"""
+    val = repl.get(key)
+    if val is None:
+        key_lower = key.lower()
+        val = repl.get(key_lower)
+        if val is None:
+            val = next((v for k, v in repl.items() if k.lower() == key_lower), default)
+    return val
+
+def _literal_items(repl: Dict[str, str]):
+    """(key, value) pairs for the case-sensitive header/textbox paths: each key as written plus its lowercase spelling"""
+    for k, v in repl.items():
+        yield k, v
+        k_lower = k.lower()
+        if k_lower != k and k_lower not in repl:
+            yield k_lower, v
 
 def discover_placeholders(text: str) -> Set[str]:
-    return set(re.findall(r"<[^<>]+>", text or ""))
+    return set(_PLACEHOLDER_RE.findall(text or ""))
 
 def iter_all_paragraphs(doc: Document):
     for p in doc.paragraphs:
         yield p
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    yield p
-                for t2 in cell.tables:
-                    for r2 in t2.rows:
-                        for c2 in r2.cells:
-                            for p2 in c2.paragraphs:
-                                yield p2
+    # Explicit stack of cell iterators instead of nested loops: a nested table is
+    # walked right after its cell's paragraphs, at any depth, in document order
+    stack = [(c for t in doc.tables for r in t.rows for c in r.cells)]
+    while stack:
+        cell = next(stack[-1], None)
+        if cell is None:
+            stack.pop()
+            continue
+        yield from cell.paragraphs
+        nested = cell.tables
+        if nested:
+            stack.append(c for t in nested for r in t.rows for c in r.cells)
+
+def _element_may_hold_placeholder(p_elm) -> bool:
+    """_may_hold_placeholder on a bare w:p element (or any element: a whole header part, a cell)"""
+    # Straight over the w:t nodes: paragraph.text would build a Run proxy per run first
+    return any("<" in t.text for t in p_elm.iter(_W_T) if t.text)
+
+def _may_hold_placeholder(paragraph) -> bool:
+    """Cheap pre-check: every placeholder (including <logo>) needs a '<'"""
+    return _element_may_hold_placeholder(paragraph._p)
 
 def iter_header_footer_paragraphs(doc: Document):
     for s in doc.sections:
@@ -582,22 +575,78 @@ def iter_header_footer_paragraphs(doc: Document):
                     for p in c.paragraphs:
                         yield p
 
-def replace_in_run_text(run_text: str, repl: Dict[str, str]):
-    if not run_text:
-        return run_text, False, False, set()
-    text = run_text
-    changed = False
-    
-    # Handle regular placeholder replacements
-    for k, v in repl.items():
+@functools.lru_cache(maxsize=32)
+def _alternation_for(keys: frozenset, flags: int = 0):
+    """
+    Compiled alternation over a set of literal keys, keyed on the keys alone so
+    every data file with the same placeholders (one per client) shares one regex.
+    Longest first so a key that prefixes another never shadows it; equal-length
+    keys cannot match at the same position, so their order is just made stable.
+    """
+    ordered = sorted(keys, key=lambda k: (-len(k), k))
+    return re.compile("|".join(re.escape(k) for k in ordered), flags)
+
+@functools.lru_cache(maxsize=16)
+def _master_pattern_for(items: Tuple[Tuple[str, str], ...], include_logo: bool = False):
+    lookup: Dict[str, str] = {}
+    for k, v in items:
         if not (k.startswith("<") and k.endswith(">")):
             continue
-        if k.lower() == PLACEHOLDER_LOGO:
+        if k.lower() == PLACEHOLDER_LOGO and not include_logo:
             continue
-        new = re.sub(re.escape(k), v, text, flags=re.IGNORECASE)
-        if new != text:
-            text = new
+        # First spelling of a key wins, as it did with the per-key loop
+        lookup.setdefault(k.lower(), v)
+    if not lookup:
+        return None, lookup
+    return _alternation_for(frozenset(lookup), re.IGNORECASE), lookup
+
+@functools.lru_cache(maxsize=16)
+def _literal_matcher_for(items: Tuple[Tuple[str, str], ...]):
+    lookup: Dict[str, str] = {}
+    for k, v in items:
+        if k:
+            lookup.setdefault(k, v or "")
+    if not lookup:
+        return None, lookup
+    return _alternation_for(frozenset(lookup)), lookup
+
+def _literal_matcher(repl: Dict[str, str], include_logo: bool = True):
+    """Case-sensitive alternation over every key as written plus its lowercase spelling (see _literal_items)"""
+    items = _literal_items(repl)
+    if not include_logo:
+        items = ((k, v) for k, v in items if k.lower() != PLACEHOLDER_LOGO)
+    return _literal_matcher_for(tuple(items))
+
+def _apply_repl(text: str, matcher) -> Tuple[str, int]:
+    """Replace every literal key in one left-to-right scan; returns (new_text, number_of_replacements)"""
+    pattern, lookup = matcher
+    if pattern is None or "<" not in text:
+        return text, 0
+    return pattern.subn(lambda m: lookup[m.group(0)], text)
+
+def _build_master_pattern(repl: Dict[str, str]):
+    """One case-insensitive alternation over every placeholder (except <logo>) plus a lowercase lookup"""
+    return _master_pattern_for(tuple(repl.items()))
+
+def replace_in_run_text(run_text: str, repl: Dict[str, str], master=None):
+    # Placeholders, <logo> and the possessive form all need a '<'; most runs are plain prose
+    if not run_text or "<" not in run_text:
+        return run_text, False, False, _EMPTY_SET
+    text = run_text
+    changed = False
+    
+    # Handle regular placeholder replacements in a single pass over the text
+    pattern, lookup = master if master is not None else _build_master_pattern(repl)
+    if pattern is not None:
+        # A run that is exactly one placeholder (the usual shape) is a plain dict hit
+        exact = lookup.get(text.lower()) if text[0] == "<" and text[-1] == ">" else None
+        if exact is not None:
+            text = exact
             changed = True
+        else:
+            text, n = pattern.subn(lambda m: lookup[m.group(0).lower()], text)
+            if n:
+                changed = True
     
     # Handle smart possessive for company names ending in 's'
     text, possessive_changed = handle_smart_possessive(text, repl)
@@ -605,37 +654,48 @@ def replace_in_run_text(run_text: str, repl: Dict[str, str]):
         changed = True
     
     logo_here = False
-    if re.search(re.escape(PLACEHOLDER_LOGO), text, flags=re.IGNORECASE):
+    text, n = _LOGO_RE.subn("", text)
+    if n:
         logo_here = True
-        text = re.sub(re.escape(PLACEHOLDER_LOGO), "", text, flags=re.IGNORECASE)
         changed = True
-    unresolved = {tok for tok in discover_placeholders(text) if tok.strip().lower() != PLACEHOLDER_LOGO}
+    if "<" in text:
+        unresolved = {m.group(0) for m in _PLACEHOLDER_RE.finditer(text) if m.group(0).strip().lower() != PLACEHOLDER_LOGO}
+    else:
+        unresolved = _EMPTY_SET
     return text, changed, logo_here, unresolved
 
-def handle_smart_possessive(text: str, repl: Dict[str, str]) -> Tuple[str, bool]:
+def possessive_replacement(repl: Dict[str, str]) -> str:
+    """
+    Text that stands in for "<company name>'s": "Support Services'" when the
+    company name ends with 's', "Acme's" otherwise, "" when there is no name.
+    Compute it once per document and pass it to handle_smart_possessive.
+    """
+    company_name = _ci_get(repl, "<company name>", "")
+    if not company_name:
+        return ""
+    if company_name.strip().endswith('s'):
+        # No extra 's' after a name that already ends in one
+        return f"{company_name}'"
+    return f"{company_name}'s"
+
+def handle_smart_possessive(text: str, repl: Dict[str, str], possessive: Optional[str] = None) -> Tuple[str, bool]:
     """
     Handle smart possessive for company names ending in 's'
     Converts "<company name>'s" to "Support Services'" if company name ends with 's'
     """
     changed = False
+    # The pattern needs both a placeholder and an apostrophe
+    if "<" not in text or "'" not in text:
+        return text, changed
     
     # Look for <company name>'s pattern
-    possessive_pattern = r'<company\s+name>\s*\'s\b'
-    
-    if re.search(possessive_pattern, text, re.IGNORECASE):
-        # Get the company name value
-        company_name = repl.get("<company name>", repl.get("<company name>", ""))
-        
-        if company_name and company_name.strip().endswith('s'):
-            # Replace <company name>'s with "Company Name'" (no extra 's')
-            new_text = re.sub(possessive_pattern, f"{company_name}'", text, flags=re.IGNORECASE)
-            print(f"Smart possessive: '{company_name}' ends with 's', using '{company_name}'' instead of '{company_name}'s'")
-            return new_text, True
-        else:
-            # Normal possessive handling for non-s ending names
-            if company_name:
-                new_text = re.sub(possessive_pattern, f"{company_name}'s", text, flags=re.IGNORECASE)
-                return new_text, True
+    if _POSSESSIVE_RE.search(text):
+        if possessive is None:
+            possessive = possessive_replacement(repl)
+        if possessive:
+            if not possessive.endswith("'s"):
+                logger.debug("Smart possessive: using %r instead of %r", possessive, f"{possessive}s")
+            return _POSSESSIVE_RE.sub(possessive, text), True
     
     return text, changed
 
@@ -643,87 +703,89 @@ def handle_smart_possessive(text: str, repl: Dict[str, str]) -> Tuple[str, bool]
 # ENHANCED LOGO INSERTION WITH SMART CONTEXT DETECTION
 # ============================================================================
 
+@functools.lru_cache(maxsize=32)
+def _part_context(content_type: str) -> Tuple[bool, bool, float]:
+    """(is_header, is_footer, recommended_width) for a part; a document only has a handful of part types"""
+    if 'header' in content_type:
+        return True, False, 20.0  # Much smaller for headers
+    if 'footer' in content_type:
+        return False, True, 15.0  # Even smaller for footers
+    return False, False, 35.0  # default
+
 def detect_header_context(paragraph):
     """Detect if we're in a header and what type of context"""
+    # Check if in header/footer
+    try:
+        is_header, is_footer, width = _part_context(paragraph.part.content_type)
+    except Exception:
+        is_header, is_footer, width = _part_context("")
     context = {
-        'is_header': False,
-        'is_footer': False,
+        'is_header': is_header,
+        'is_footer': is_footer,
         'is_in_table': False,
-        'recommended_width': 35.0  # default
+        'recommended_width': width,
     }
     
-    # Check if in header/footer
-    try:
-        part_type = paragraph._part.content_type
-        if 'header' in part_type:
-            context['is_header'] = True
-            context['recommended_width'] = 20.0  # Much smaller for headers
-        elif 'footer' in part_type:
-            context['is_footer'] = True
-            context['recommended_width'] = 15.0  # Even smaller for footers
-    except:
-        pass
-    
-    # Check if in table (common in headers)
-    try:
-        parent = paragraph._element.getparent()
-        while parent is not None:
-            if parent.tag.endswith('tc'):  # table cell
-                context['is_in_table'] = True
-                if context['is_header']:
-                    context['recommended_width'] = 18.0  # Very small for header tables
-                else:
-                    context['recommended_width'] = 25.0  # Medium for body tables
-                break
-            parent = parent.getparent()
-    except:
-        pass
+    # Check if in table (common in headers): one ascent to the nearest table cell
+    if next(paragraph._element.iterancestors(_W_TC), None) is not None:
+        context['is_in_table'] = True
+        if context['is_header']:
+            context['recommended_width'] = 18.0  # Very small for header tables
+        else:
+            context['recommended_width'] = 25.0  # Medium for body tables
     
     return context
 
-def process_par_safe_logo_smart(paragraph, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 35.0, dry: bool = False):
+def process_par_safe_logo_smart(paragraph, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 35.0, dry: bool = False, master=None, logo_bytes: Optional[bytes] = None):
     """
     Enhanced safe version with smart logo sizing based on context
     """
     changed = False
     logo_trig = False
     unresolved_all: Set[str] = set()
+    if master is None:
+        master = _build_master_pattern(repl)
     
     # Process text replacements
     for run in paragraph.runs:
-        new, chg, l_here, unres = replace_in_run_text(run.text, repl)
-        run.text = new
+        new, chg, l_here, unres = replace_in_run_text(run.text, repl, master)
         if chg:
+            # Only rewrite runs that changed; the run.text setter rebuilds the run's children
+            run.text = new
             changed = True
         if l_here:
             logo_trig = True
-        unresolved_all.update(unres)
+        if unres:
+            unresolved_all |= unres
+    
+    # Common case: no <logo> here (or nothing to insert), so skip the logo machinery entirely
+    if not logo_trig or not logo or dry:
+        return changed, False, unresolved_all
     
     logo_inserted = False
-    if logo_trig and logo and not dry:
-        
-        # SMART SIZING: Detect context and adjust logo size
-        context = detect_header_context(paragraph)
-        smart_width = context['recommended_width']
-        
-        print(f"Logo context: header={context['is_header']}, table={context['is_in_table']}, width={smart_width}mm")
-        
-        # Set paragraph alignment to right
-        try:
-            paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            print(f"Set paragraph alignment to right")
-        except Exception as align_error:
-            print(f"Could not set alignment: {align_error}")
-        
-        # Add the logo with context-appropriate size
-        try:
-            r = paragraph.add_run()
-            r.add_picture(str(logo), width=Mm(smart_width))
-            print(f"Logo inserted and right-aligned (width: {smart_width}mm)")
-            logo_inserted = True
-            changed = True
-        except Exception as logo_error:
-            print(f"Logo insertion failed: {logo_error}")
+    
+    # SMART SIZING: Detect context and adjust logo size
+    context = detect_header_context(paragraph)
+    smart_width = context['recommended_width']
+    
+    logger.debug("Logo context: header=%s, table=%s, width=%smm", context['is_header'], context['is_in_table'], smart_width)
+    
+    # Set paragraph alignment to right
+    try:
+        paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        logger.debug("Set paragraph alignment to right")
+    except Exception as align_error:
+        logger.warning("Could not set alignment: %s", align_error)
+    
+    # Add the logo with context-appropriate size
+    try:
+        r = paragraph.add_run()
+        r.add_picture(_logo_source(logo, logo_bytes), width=Mm(smart_width))
+        logger.debug("Logo inserted and right-aligned (width: %smm)", smart_width)
+        logo_inserted = True
+        changed = True
+    except Exception as logo_error:
+        logger.warning("Logo insertion failed: %s", logo_error)
     
     return changed, logo_inserted, unresolved_all
 
@@ -737,57 +799,51 @@ def process_shape_textboxes_enhanced(doc: Document, repl: Dict[str, str]) -> boo
     """
     changed = False
     shapes_processed = 0
+    replaced = 0
+    debug = logger.isEnabledFor(logging.DEBUG)
     
     try:
-        print(f"Processing shape-based textboxes for placeholders...")
+        logger.debug("Processing shape-based textboxes for placeholders...")
         
         # Get the document XML root
         doc_element = doc.element
-        
-        # Define namespaces for drawing shapes
-        namespaces = {
-            'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
-            'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing',
-            'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-            'pic': 'http://schemas.openxmlformats.org/drawingml/2006/picture',
-            'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
-        }
+        matcher = _literal_matcher(repl)
+        possessive = possessive_replacement(repl)
         
         # Look for drawing elements that contain text
-        drawings = doc_element.xpath('.//w:drawing', namespaces=namespaces)
-        print(f"Found {len(drawings)} drawing elements")
+        drawings = _XP_DRAWING(doc_element)
+        logger.debug("Found %d drawing elements", len(drawings))
         
         for i, drawing in enumerate(drawings):
             # Look for text content within drawing shapes
             try:
                 # Method 1: Look for drawing paragraphs (a:p)
-                drawing_paragraphs = drawing.xpath('.//a:p', namespaces=namespaces)
+                drawing_paragraphs = _XP_A_P(drawing)
                 if drawing_paragraphs:
-                    print(f"Shape {i+1}: Found {len(drawing_paragraphs)} drawing paragraphs")
+                    logger.debug("Shape %d: Found %d drawing paragraphs", i + 1, len(drawing_paragraphs))
                     shapes_processed += 1
                     
                     for j, dp in enumerate(drawing_paragraphs):
                         # Get text runs within the drawing paragraph
-                        text_runs = dp.xpath('.//a:t', namespaces=namespaces)
+                        text_runs = _XP_A_T(dp)
                         
                         for k, text_run in enumerate(text_runs):
                             original_text = text_run.text or ""
                             
-                            if original_text.strip():
-                                print(f"    Text in shape {i+1}, para {j+1}, run {k+1}: '{original_text}'")
+                            if debug and original_text.strip():
+                                logger.debug("    Text in shape %d, para %d, run %d: %r", i + 1, j + 1, k + 1, original_text)
                             
                             if "<" in original_text:
                                 new_text = original_text
                                 
-                                # Replace placeholders (including ALL placeholders)
-                                for placeholder, value in repl.items():
-                                    if placeholder in new_text:
-                                        new_text = new_text.replace(placeholder, value or "")
-                                        changed = True
-                                        print(f"    Replaced '{placeholder}' with '{value}' in shape {i+1}")
+                                # Replace placeholders (including ALL placeholders) in one pass
+                                new_text, hits = _apply_repl(new_text, matcher)
+                                if hits:
+                                    changed = True
+                                    replaced += hits
                                 
                                 # Handle smart possessive for shape text
-                                new_text, possessive_changed = handle_smart_possessive(new_text, repl)
+                                new_text, possessive_changed = handle_smart_possessive(new_text, repl, possessive)
                                 if possessive_changed:
                                     changed = True
                                 
@@ -795,114 +851,158 @@ def process_shape_textboxes_enhanced(doc: Document, repl: Dict[str, str]) -> boo
                                 text_run.text = new_text
                 
                 # Method 2: Look for text in textboxes (w:txbxContent)
-                textboxes = drawing.xpath('.//w:txbxContent', namespaces=namespaces)
+                textboxes = _XP_TXBX(drawing)
                 if textboxes:
-                    print(f"Shape {i+1}: Found {len(textboxes)} textboxes")
+                    logger.debug("Shape %d: Found %d textboxes", i + 1, len(textboxes))
                     for tb_idx, textbox in enumerate(textboxes):
-                        tb_changed = process_textbox_content_enhanced(textbox, repl, f"{i+1}-{tb_idx+1}", namespaces)
+                        tb_changed = process_textbox_content_enhanced(textbox, repl, f"{i+1}-{tb_idx+1}", _NS, matcher, possessive)
                         if tb_changed:
                             changed = True
                             shapes_processed += 1
                 
             except Exception as shape_error:
-                print(f"Error processing shape {i+1}: {shape_error}")
+                logger.warning("Error processing shape %d: %s", i + 1, shape_error)
         
-        print(f"Processed {shapes_processed} shape-based textboxes")
+        logger.debug("Processed %d shape-based textboxes, replaced %d placeholder(s) in shape text", shapes_processed, replaced)
         return changed
         
     except Exception as e:
-        print(f"Error processing shape textboxes: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("Error processing shape textboxes: %s", e, exc_info=True)
         return False
 
-def process_textbox_content_enhanced(textbox_element, repl: Dict[str, str], textbox_id: str, namespaces: dict) -> bool:
+def process_textbox_content_enhanced(textbox_element, repl: Dict[str, str], textbox_id: str, namespaces: dict = _NS, matcher=None, possessive: Optional[str] = None) -> bool:
     """
     Enhanced processing of content within a single textbox element
     """
     changed = False
+    replaced = 0
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if matcher is None:
+        matcher = _literal_matcher(repl)
     
     try:
-        # Get all text nodes in this textbox using proper namespaces
-        text_nodes = textbox_element.xpath('.//w:t', namespaces=namespaces)
-        print(f"Textbox {textbox_id}: Found {len(text_nodes)} text nodes")
+        # Get all text nodes in this textbox (tree walk on the w:t tag; `namespaces` is kept for callers)
+        text_nodes = list(textbox_element.iter(_W_T))
+        logger.debug("Textbox %s: Found %d text nodes", textbox_id, len(text_nodes))
         
         for i, text_node in enumerate(text_nodes):
             original_text = text_node.text or ""
             
-            if original_text.strip():  # Only log non-empty text
-                print(f"    Text node {i}: '{original_text}'")
+            if debug and original_text.strip():  # Only log non-empty text
+                logger.debug("    Text node %d: %r", i, original_text)
             
             if "<" in original_text:
                 new_text = original_text
                 
-                # Replace ALL placeholders (including logo placeholders)
-                for placeholder, value in repl.items():
-                    if placeholder in new_text:
-                        new_text = new_text.replace(placeholder, value or "")
-                        changed = True
-                        print(f"    Replaced '{placeholder}' with '{value}' in textbox {textbox_id}")
+                # Replace ALL placeholders (including logo placeholders) in one pass
+                new_text, hits = _apply_repl(new_text, matcher)
+                if hits:
+                    changed = True
+                    replaced += hits
                 
                 # Handle smart possessive for textbox content
-                new_text, possessive_changed = handle_smart_possessive(new_text, repl)
+                new_text, possessive_changed = handle_smart_possessive(new_text, repl, possessive)
                 if possessive_changed:
                     changed = True
                 
                 # Update the text node
                 text_node.text = new_text
         
+        if replaced:
+            logger.debug("    Replaced %d placeholder(s) in textbox %s", replaced, textbox_id)
         return changed
         
     except Exception as e:
-        print(f"Error processing textbox content for {textbox_id}: {e}")
+        logger.warning("Error processing textbox content for %s: %s", textbox_id, e)
         return False
 
 # ============================================================================
 # XML PROCESSING FUNCTIONS (UNCHANGED BUT IMPROVED)
 # ============================================================================
 
-def _cross_run_replace_xml(p_elm, repl: Dict[str, str]):
-    """Enhanced XML replacement with smart possessive handling"""
-    t_nodes = p_elm.xpath('.//w:t')
+def _cross_run_pattern(repl: Dict[str, str]):
+    """(pattern, lowercase lookup) over every <...> key, <logo> included, for _cross_run_replace_xml"""
+    return _master_pattern_for(tuple(repl.items()), include_logo=True)
+
+def _replace_across_texts(texts: List[str], pattern, lookup: Dict[str, str]) -> Tuple[List[str], bool, bool]:
+    """
+    Pure-string kernel of _cross_run_replace_xml: replace every token in the
+    concatenation of `texts` and redistribute the result over the same number
+    of pieces. A token spanning pieces is written into the first of them; the
+    pieces it covered are emptied and the last keeps only what follows it.
+    Returns (new_texts, changed, logo_found).
+    """
+    full_text = "".join(texts)
+    if pattern is None or "<" not in full_text:
+        return texts, False, False
+    if len(texts) == 1:
+        # Single piece: nothing can straddle a boundary, so one subn does it all
+        logo_hits = []
+
+        def _value(m):
+            tl = m.group(0).lower()
+            if tl == PLACEHOLDER_LOGO:
+                logo_hits.append(m)
+                return ""
+            return str(lookup.get(tl, ""))
+
+        new_text, n = pattern.subn(_value, full_text)
+        if not n:
+            return texts, False, False
+        return [new_text], True, bool(logo_hits)
+    matches = list(pattern.finditer(full_text))
+    if not matches:
+        return texts, False, False
+    texts = list(texts)
+    logo = False
+    # starts[i] is the offset of texts[i] in full_text; bisect_right lands on the
+    # last piece starting at or before a position, which skips empty pieces
+    starts = list(accumulate((len(t) for t in texts[:-1]), initial=0))
+    # Right to left so the offsets of earlier matches stay valid
+    for m in reversed(matches):
+        s, e = m.span()
+        sn = bisect_right(starts, s) - 1
+        en = bisect_right(starts, e - 1) - 1
+        so = s - starts[sn]
+        eo = e - starts[en]
+        tl = m.group(0).lower()
+        if tl == PLACEHOLDER_LOGO:
+            val = ""
+            logo = True
+        else:
+            val = str(lookup.get(tl, ""))
+        right = texts[en][eo:]
+        texts[sn] = texts[sn][:so] + val + (right if sn == en else "")
+        for k in range(sn + 1, en):
+            texts[k] = ""
+        if en != sn:
+            texts[en] = right
+    return texts, True, logo
+
+def _cross_run_replace_xml(p_elm, repl: Dict[str, str], token_pattern=None, possessive: Optional[str] = None):
+    """
+    Enhanced XML replacement with smart possessive handling.
+    Per-paragraph callers pass token_pattern (from _cross_run_pattern) and
+    possessive (from possessive_replacement), built once per document.
+    """
+    t_nodes = list(p_elm.iter(_W_T))
     if not t_nodes:
         return False, False, set()
-    texts = [(t.text or "") for t in t_nodes]
-    changed = False
-    logo = False
-    tokens = [k for k in repl.keys() if k.startswith("<") and k.endswith(">")]
-    tokens = list(dict.fromkeys(sorted(tokens, key=lambda s: -len(s))))
-
-    def find(token_lower: str, sn: int = 0, so: int = 0):
-        i = sn
-        j = 0
-        off = so
-        while i < len(texts):
-            nt = texts[i]
-            while off < len(nt) and j < len(token_lower):
-                if nt[off].lower() != token_lower[j]:
-                    break
-                off += 1
-                j += 1
-            if j == len(token_lower):
-                return sn, so, i, off
-            if off < len(nt) and nt[off].lower() != token_lower[j]:
-                so += 1
-                if so >= len(texts[sn]):
-                    sn += 1
-                    so = 0
-                i = sn
-                j = 0
-                off = so
-                continue
-            i += 1
-            off = 0
-        return None
-
+    original = [(t.text or "") for t in t_nodes]
     # Join all text for possessive processing
-    full_text = "".join(texts)
+    full_text = "".join(original)
+    # Placeholders, <logo> and the possessive form all need a '<'
+    if "<" not in full_text:
+        return False, False, set()
+    texts = original
+    changed = False
+    # (pattern, lowercase lookup) over every <...> key, <logo> included
+    if token_pattern is None:
+        token_pattern = _cross_run_pattern(repl)
+    pattern, lookup = token_pattern
     
     # Handle smart possessive first
-    full_text, possessive_changed = handle_smart_possessive(full_text, repl)
+    full_text, possessive_changed = handle_smart_possessive(full_text, repl, possessive)
     if possessive_changed:
         changed = True
         # Update the texts array with the new text
@@ -911,116 +1011,61 @@ def _cross_run_replace_xml(p_elm, repl: Dict[str, str]):
         for i in range(1, len(t_nodes)):
             texts.append("")
 
-    pn = 0
-    po = 0
-    while pn < len(texts):
-        if all('<' not in t for t in texts[pn:]):
-            break
-        cur = texts[pn]
-        if po < len(cur) and cur[po] != '<':
-            po += 1
-            if po >= len(cur):
-                pn += 1
-                po = 0
-            continue
-        matched = False
-        for tok in tokens:
-            tl = tok.lower()
-            hit = find(tl, pn, po)
-            if not hit:
-                continue
-            sn, so, en, eo = hit
-            val = repl.get(tok, repl.get(tok.lower(), ""))
-            if tl == PLACEHOLDER_LOGO:
-                val = ""
-                logo = True
-            left = texts[sn][:so]
-            right = texts[en][eo:]
-            texts[sn] = left + str(val) + (right if sn == en else "")
-            for k in range(sn + 1, en + 1):
-                if k == en:
-                    texts[k] = texts[k][eo:]
-                else:
-                    texts[k] = ""
-            changed = True
-            pn = sn
-            po = so + len(str(val))
-            matched = True
-            break
-        if not matched:
-            po += 1
-            if po >= len(cur):
-                pn += 1
-                po = 0
-    for t, nt in zip(t_nodes, texts):
-        t.text = nt
-    after = "".join(texts)
+    texts, replaced, logo = _replace_across_texts(texts, pattern, lookup)
+    changed = changed or replaced
+    if changed:
+        # Only touch the nodes whose text actually moved
+        for t, old, nt in zip(t_nodes, original, texts):
+            if nt != old:
+                t.text = nt
+        after = "".join(texts)
+    else:
+        after = full_text
     unresolved = {t for t in discover_placeholders(after) if t.strip().lower() != PLACEHOLDER_LOGO}
     return changed, logo, unresolved
 
-def _has_image_anywhere_in(elt) -> bool:
-    # Check for various image-related elements separately to avoid XPath complexity
-    image_checks = [
-        './/w:drawing',
-        './/w:pict', 
-        './/v:imagedata',
-        './/a:blip',
-        './/pic:pic',
-        './/w:object'
-    ]
-    
-    for xpath in image_checks:
-        try:
-            if elt.xpath(xpath):
-                return True
-        except:
-            continue
-    
-    # Fallback: check XML content for image indicators
-    try:
-        xml_str = str(elt) if hasattr(elt, '__str__') else ""
-        image_indicators = ['drawing', 'pict', 'imagedata', 'blip', 'graphic', 'pic:', 'embed']
-        return any(indicator in xml_str.lower() for indicator in image_indicators)
-    except:
-        return False
-
-def _ancestor_with_images(p_elm) -> bool:
-    # Simplified ancestor checking - check each ancestor type separately
-    ancestor_types = ['tc', 'tr', 'tbl', 'sdt', 'txbxContent', 'hdr', 'ftr']
-    
-    for anc_type in ancestor_types:
-        try:
-            ancestors = p_elm.xpath(f'ancestor::*[local-name()="{anc_type}"]')
-            for ancestor in ancestors:
-                if _has_image_anywhere_in(ancestor):
-                    return True
-        except:
-            continue
-    
+def _has_image_anywhere_in(elt, cache: Optional[dict] = None) -> bool:
+    # Walks descendants until the first image-related element; no serialisation fallback.
+    # `cache` (element -> bool) lets one pass scan each paragraph/container subtree once
+    if cache is not None:
+        found = cache.get(elt)
+        if found is not None:
+            return found
+    found = next(elt.iterdescendants(*_IMAGE_TAGS), None) is not None
+    if cache is not None:
+        cache[elt] = found
+    return found
+
+def _ancestor_with_images(p_elm, cache: Optional[dict] = None) -> bool:
+    # One upward walk; containers are matched on local name, whatever their namespace
+    for ancestor in p_elm.iterancestors():
+        if ancestor.tag.rpartition('}')[2] in _ANCESTOR_TYPES and _has_image_anywhere_in(ancestor, cache):
+            return True
     return False
 
-def _paragraph_contains_image(p_elm) -> bool:
-    """Check if paragraph itself directly contains image content"""
-    # Simplified image detection in paragraph runs
-    try:
-        # Check for drawing elements
-        if p_elm.xpath('.//w:drawing'):
-            return True
-        # Check for picture elements  
-        if p_elm.xpath('.//w:pict'):
-            return True
-        # Check for objects
-        if p_elm.xpath('.//w:object'):
-            return True
-    except:
-        pass
-    
-    # Fallback: string-based detection
-    try:
-        xml_content = str(p_elm) if hasattr(p_elm, '__str__') else ""
-        return any(indicator in xml_content.lower() for indicator in ['<w:drawing', '<w:pict', '<w:object', 'imagedata', 'blip'])
-    except:
-        return False
+def _image_paragraphs(root) -> Set:
+    """
+    Every w:p under root that contains image content, from one walk over the image tags.
+    Holds the elements themselves: lxml hands back the same proxy only while one is referenced.
+    """
+    found = set()
+    for img in root.iter(*_IMAGE_TAGS):
+        for anc in img.iterancestors(_W_P):
+            if anc in found:
+                break  # its outer paragraphs were recorded with it
+            found.add(anc)
+    return found
+
+def _with_neighbours(items):
+    """Yield (previous, current, next) over an iterator, with None past either end; pulls one item ahead"""
+    prev = cur = None
+    started = False
+    for nxt in items:
+        if started:
+            yield prev, cur, nxt
+        prev, cur, started = cur, nxt, True
+    if started:
+        yield prev, cur, None
 
 def prune_or_rescue_body_shapes(doc: Document, repl: Dict[str, str], report_missing: Set[str]) -> Tuple[int, int, int]:
     changed_count = 0
@@ -1028,108 +1073,105 @@ def prune_or_rescue_body_shapes(doc: Document, repl: Dict[str, str], report_miss
     pruned_count = 0
 
     root = doc.element.body
-    paragraphs = list(root.xpath('.//w:p'))
-    token_re = re.compile(r"<[^<>]+>")
-
-    # Enhanced image presence detection
-    has_img_here = [_has_image_anywhere_in(p) or _paragraph_contains_image(p) for p in paragraphs]
-
-    for idx, p in enumerate(paragraphs):
-        joined = "".join((t.text or "") for t in p.xpath('.//w:t'))
-        jl = joined.lower()
-
-        # Never prune the paragraph that has <logo>
-        if "<logo>" in jl:
-            if "<" in joined:
-                chg, lg, unresolved = _cross_run_replace_xml(p, repl)
-                if chg: changed_count += 1
-                if lg:  logo_hits += 1
-                report_missing.update(unresolved)
+    token_pattern = _cross_run_pattern(repl)
+    # Lowercased key -> value, built once; tokens below are already lowercase
+    repl_ci = token_pattern[1]
+    possessive = possessive_replacement(repl)
+
+    # Enhanced image presence detection: every check below reads this cache, so each
+    # paragraph and each table/cell/sdt container subtree is scanned at most once
+    img_cache: Dict = {}
+
+    # Streamed in document order with a one-paragraph look-ahead. Removing `p` below is
+    # safe because the walk has already moved on to `next_p`, and `p` is never its
+    # ancestor: a paragraph holding nested paragraphs holds a drawing/pict and is kept
+    for prev_p, p, next_p in _with_neighbours(root.iter(_W_P)):
+        joined = "".join((t.text or "") for t in p.iter(_W_T))
+        # No '<' means nothing to rescue and no token to prune on
+        if "<" not in joined:
+            continue
+
+        # Never prune the paragraph that has <logo> (case-insensitive scan, no lowered copy)
+        if _LOGO_RE.search(joined):
+            chg, lg, unresolved = _cross_run_replace_xml(p, repl, token_pattern, possessive)
+            if chg: changed_count += 1
+            if lg:  logo_hits += 1
+            report_missing.update(unresolved)
             continue
 
         # ENHANCED: Skip any paragraph that directly contains images
-        if _paragraph_contains_image(p):
+        if _has_image_anywhere_in(p, img_cache):
             # Still do replacements but never prune
-            if "<" in joined:
-                chg, lg, unresolved = _cross_run_replace_xml(p, repl)
-                if chg: changed_count += 1
-                if lg:  logo_hits += 1
-                report_missing.update(unresolved)
+            chg, lg, unresolved = _cross_run_replace_xml(p, repl, token_pattern, possessive)
+            if chg: changed_count += 1
+            if lg:  logo_hits += 1
+            report_missing.update(unresolved)
             continue
 
         # Rescue split placeholders first
-        chg, lg, unresolved = _cross_run_replace_xml(p, repl)
+        chg, lg, unresolved = _cross_run_replace_xml(p, repl, token_pattern, possessive)
         if chg: changed_count += 1
         if lg:  logo_hits += 1
         report_missing.update(unresolved)
 
-        # Re-read after rescue
-        joined = "".join((t.text or "") for t in p.xpath('.//w:t'))
-        jl = joined.lower()
-
-        tokens_in_par = [tok.lower() for tok in token_re.findall(jl)]
-        if not tokens_in_par:
+        # Whatever <...> survived the rescue is exactly `unresolved`; no need to re-read the runs
+        if not unresolved:
             continue
+        tokens_in_par = [tok.lower() for tok in unresolved]
 
-        # Ultra image-protection with enhanced detection:
+        # Ultra image-protection with enhanced detection (this paragraph's own images
+        # were handled above, so only the neighbours and containers remain):
         neighbour_image = (
-            has_img_here[idx] or 
-            (idx > 0 and has_img_here[idx-1]) or 
-            (idx+1 < len(has_img_here) and has_img_here[idx+1])
+            (prev_p is not None and _has_image_anywhere_in(prev_p, img_cache)) or 
+            (next_p is not None and _has_image_anywhere_in(next_p, img_cache))
         )
-        container_image = _ancestor_with_images(p)
+        container_image = _ancestor_with_images(p, img_cache)
         
-        # ADDITIONAL SAFETY: Check for any image-related content more safely
-        try:
-            has_image_indicators = _has_image_anywhere_in(p) or _paragraph_contains_image(p)
-        except:
-            has_image_indicators = True  # If we can't check safely, assume there are images
-        
-        if neighbour_image or container_image or has_image_indicators:
+        if neighbour_image or container_image:
             # Do not prune anything near images or with image indicators
             continue
 
-        # Additional safety: Check if paragraph is very short (likely contains only an image)
-        text_content = joined.strip()
-        if len(text_content) < 50 and not tokens_in_par:  # Very short, no placeholders
-            continue
-
         # Remove only if ALL tokens are blank/missing AND no image protection applies
         all_blank = True
         for tok in tokens_in_par:
-            val = repl.get(tok, repl.get(tok.lower(), None))
+            val = repl_ci.get(tok)
             if val is not None and str(val).strip() != "":
                 all_blank = False
                 break
         
         if all_blank:
-            # Final safety check before removal
-            if not _has_image_anywhere_in(p) and not _paragraph_contains_image(p):
-                parent = p.getparent()
-                if parent is not None:
-                    parent.remove(p)
-                    pruned_count += 1
+            # Image-bearing paragraphs never get this far (checked above), so remove
+            parent = p.getparent()
+            if parent is not None:
+                parent.remove(p)
+                pruned_count += 1
 
     return changed_count, logo_hits, pruned_count
 
 def rescue_header_footer_shapes(doc: Document, repl: Dict[str, str], report_missing: Set[str]) -> Tuple[int, int]:
     changed_count = 0
     logo_hits = 0
+    token_pattern = _cross_run_pattern(repl)
+    possessive = possessive_replacement(repl)
     for part in doc.part.package.parts:
         if part.content_type in (
             "application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml",
             "application/vnd.openxmlformats-officedocument.wordprocessingml.footer+xml",
         ):
-            for p in part.element.xpath('.//w:p'):
-                joined = "".join((t.text or "") for t in p.xpath('.//w:t'))
-                if "<" not in joined:
+            root = part.element
+            # Most headers/footers hold no placeholder at all: one streaming pass over the text nodes
+            if not any("<" in (t.text or "") for t in root.iter(_W_T)):
+                continue
+            # Only text is rewritten below, so walking the live tree is safe
+            for p in root.iter(_W_P):
+                if not any("<" in (t.text or "") for t in p.iter(_W_T)):
                     continue
                 
                 # Enhanced: Don't modify paragraphs with images in headers/footers
                 if _has_image_anywhere_in(p):
                     continue
                     
-                chg, lg, unresolved = _cross_run_replace_xml(p, repl)
+                chg, lg, unresolved = _cross_run_replace_xml(p, repl, token_pattern, possessive)
                 if chg:
                     changed_count += 1
                 if lg:
@@ -1141,7 +1183,7 @@ def rescue_header_footer_shapes(doc: Document, repl: Dict[str, str], report_miss
 # MAIN DOCUMENT PROCESSING
 # ============================================================================
 
-def process_headers_and_footers_original_safe(doc: Document, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 15.0, dry: bool = False):
+def process_headers_and_footers_original_safe(doc: Document, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 15.0, dry: bool = False, matcher=None, logo_bytes: Optional[bytes] = None):
     """
     ORIGINAL SAFE processing of headers and footers - NO alignment changes
     """
@@ -1149,13 +1191,16 @@ def process_headers_and_footers_original_safe(doc: Document, repl: Dict[str, str
     logos_inserted = 0
     
     try:
-        print(f"Processing headers and footers (ORIGINAL SAFE method)...")
+        logger.debug("Processing headers and footers (ORIGINAL SAFE method)...")
+        # <logo> stays in the text so each paragraph can still detect it
+        if matcher is None:
+            matcher = _literal_matcher(repl, include_logo=False)
         
         for section in doc.sections:
             # Process header
             if section.header:
                 header_changed, header_logos = process_header_footer_content_original_safe(
-                    section.header, repl, logo, width_mm, dry, "Header"
+                    section.header, repl, logo, width_mm, dry, "Header", matcher, logo_bytes
                 )
                 if header_changed:
                     changed = True
@@ -1164,20 +1209,28 @@ def process_headers_and_footers_original_safe(doc: Document, repl: Dict[str, str
             # Process footer
             if section.footer:
                 footer_changed, footer_logos = process_header_footer_content_original_safe(
-                    section.footer, repl, logo, width_mm, dry, "Footer"
+                    section.footer, repl, logo, width_mm, dry, "Footer", matcher, logo_bytes
                 )
                 if footer_changed:
                     changed = True
                 logos_inserted += footer_logos
         
-        print(f"Processed headers/footers ORIGINAL SAFE method, inserted {logos_inserted} logos")
+        logger.debug("Processed headers/footers ORIGINAL SAFE method, inserted %s logos", logos_inserted)
         return changed, logos_inserted
         
     except Exception as e:
-        print(f"Error processing headers/footers: {e}")
+        logger.warning("Error processing headers/footers: %s", e)
         return False, 0
 
-def process_header_footer_content_original_safe(hf_part, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 15.0, dry: bool = False, part_type: str = "Header"):
+def _iter_hf_paragraphs(hf_part, part_type: str = "Header"):
+    """Yield (paragraph, context_label) for a header/footer: its own paragraphs, then those in its tables"""
+    for paragraph in hf_part.paragraphs:
+        yield paragraph, part_type
+    table_context = f"{part_type} Table"
+    for paragraph in (p for t in hf_part.tables for r in t.rows for c in r.cells for p in c.paragraphs):
+        yield paragraph, table_context
+
+def process_header_footer_content_original_safe(hf_part, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 15.0, dry: bool = False, part_type: str = "Header", matcher=None, logo_bytes: Optional[bytes] = None):
     """
     ORIGINAL SAFE processing - simple text replacement and logo insertion WITHOUT alignment changes
     """
@@ -1185,41 +1238,37 @@ def process_header_footer_content_original_safe(hf_part, repl: Dict[str, str], l
     logos_inserted = 0
     
     try:
-        # Process all paragraphs in header/footer
-        for paragraph in hf_part.paragraphs:
+        # Placeholders and <logo> both need a '<'; plain "Page X of Y" parts are done after one w:t scan
+        if not _element_may_hold_placeholder(hf_part._element):
+            return False, 0
+        
+        # Paragraphs first, then the paragraphs of its tables, in one walk
+        for paragraph, context in _iter_hf_paragraphs(hf_part, part_type):
             para_changed, para_logos = process_header_paragraph_original_safe(
-                paragraph, repl, logo, width_mm, dry, part_type
+                paragraph, repl, logo, width_mm, dry, context, matcher, logo_bytes
             )
             if para_changed:
                 changed = True
             if para_logos:
                 logos_inserted += para_logos
         
-        # Process tables in header/footer
-        for table in hf_part.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        para_changed, para_logos = process_header_paragraph_original_safe(
-                            paragraph, repl, logo, width_mm, dry, f"{part_type} Table"
-                        )
-                        if para_changed:
-                            changed = True
-                        if para_logos:
-                            logos_inserted += para_logos
-        
         return changed, logos_inserted
         
     except Exception as e:
-        print(f"Error processing {part_type}: {e}")
+        logger.warning("Error processing %s: %s", part_type, e)
         return False, 0
 
-def process_header_paragraph_original_safe(paragraph, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 15.0, dry: bool = False, context: str = "Header"):
+def process_header_paragraph_original_safe(paragraph, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 15.0, dry: bool = False, context: str = "Header", matcher=None, logo_bytes: Optional[bytes] = None):
     """
     ORIGINAL SAFE processing - NO alignment changes, simple logo insertion
     """
     changed = False
     logo_found = False
+    # Most header/footer paragraphs hold no placeholder; don't build their runs at all
+    if not _may_hold_placeholder(paragraph):
+        return False, 0
+    if matcher is None:
+        matcher = _literal_matcher(repl, include_logo=False)
     
     try:
         # First pass: text replacement and logo detection
@@ -1228,49 +1277,97 @@ def process_header_paragraph_original_safe(paragraph, repl: Dict[str, str], logo
             if original_text and "<" in original_text:
                 new_text = original_text
                 
-                # Replace all placeholders except <logo>
-                for placeholder, value in repl.items():
-                    if placeholder.lower() != "<logo>" and placeholder in new_text:
-                        new_text = new_text.replace(placeholder, value or "")
-                        changed = True
+                # Replace all placeholders except <logo> in one pass
+                new_text, hits = _apply_repl(new_text, matcher)
+                if hits:
+                    changed = True
                 
-                # Check for logo placeholder
-                if "<logo>" in new_text.lower():
+                # Check for logo placeholder and remove its text in the same scan
+                new_text, logo_hits = _LOGO_RE.subn("", new_text)
+                if logo_hits:
                     logo_found = True
-                    # Remove logo placeholder text
-                    new_text = re.sub(r"<logo>", "", new_text, flags=re.IGNORECASE)
                     changed = True
                 
-                run.text = new_text
+                # The run.text setter rebuilds the run's children; skip it when nothing matched
+                if hits or logo_hits:
+                    run.text = new_text
         
         # Second pass: insert logo if found (NO ALIGNMENT CHANGES)
         logos_inserted = 0
-        if logo_found and logo and logo.exists() and not dry:
+        # process_docx only passes a logo that exists
+        if logo_found and logo and not dry:
             try:
-                print(f"Inserting logo in {context} (width: {width_mm}mm) - NO alignment changes")
+                logger.debug("Inserting logo in %s (width: %smm) - NO alignment changes", context, width_mm)
                 
                 # Simple insertion with NO alignment changes (like original safe version)
                 run = paragraph.add_run()
-                run.add_picture(str(logo), width=Mm(width_mm))
+                run.add_picture(_logo_source(logo, logo_bytes), width=Mm(width_mm))
                 
                 logos_inserted = 1
                 changed = True
-                print(f"Logo inserted successfully in {context} (no alignment changes)")
+                logger.debug("Logo inserted successfully in %s (no alignment changes)", context)
                 
             except Exception as logo_error:
-                print(f"Logo insertion failed in {context}: {logo_error}")
+                logger.warning("Logo insertion failed in %s: %s", context, logo_error)
         
         return changed, logos_inserted
         
     except Exception as e:
-        print(f"Error processing paragraph in {context}: {e}")
+        logger.warning("Error processing paragraph in %s: %s", context, e)
         return False, 0
 
-def process_docx(input_path: Path, output_path: Path, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 35.0, dry: bool = False):
+def _load_document(path: Path) -> Document:
+    """Document(path) parsed with _LOAD_PARSER; python-docx's parser is put back whatever happens"""
+    docx.oxml.oxml_parser = _LOAD_PARSER
+    try:
+        return Document(str(path))
+    finally:
+        # Always the original, never whatever was installed on entry, so overlapping loads
+        # (Streamlit sessions share the module) cannot leave the swap in place
+        docx.oxml.oxml_parser = _DOCX_OXML_PARSER
+
+def _part_may_need_processing(source, check_version_control: bool) -> bool:
+    """Stream one XML part: any text with a '<', or (if asked) a version control keyword anywhere in its text"""
+    chunks: List[str] = []
+    for _event, elem in etree.iterparse(source, events=("end",), resolve_entities=False):
+        for text in (elem.text, elem.tail):
+            if text:
+                if "<" in text:
+                    return True
+                if check_version_control:
+                    chunks.append(text)
+        # Children have already ended; drop this element's content and its finished siblings
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    # Joined across paragraphs, so this can only over-report; a false hit just means a full pass
+    joined = "".join(chunks).lower()
+    return any(kw in joined for kw in _VC_KEYWORDS)
+
+def _may_need_processing(docx_path: Path, check_version_control: bool) -> bool:
+    """
+    Pre-scan of the word/*.xml parts without building a tree. False only when no text holds
+    a '<' (no placeholder, no <logo>) and, if asked, nothing mentions a version control keyword.
+    Anything unreadable answers True, so the full pass gets to report it.
+    """
+    try:
+        with zipfile.ZipFile(docx_path) as z:
+            for name in z.namelist():
+                if name.startswith("word/") and name.endswith(".xml"):
+                    with z.open(name) as part:
+                        if _part_may_need_processing(part, check_version_control):
+                            return True
+    except Exception:
+        return True
+    return False
+
+def process_docx(input_path: Path, output_path: Path, repl: Dict[str, str], logo: Optional[Path] = None, width_mm: float = 35.0, dry: bool = False, logo_bytes: Optional[bytes] = None):
     """
-    Enhanced processing with smart logo sizing and comprehensive textbox handling
+    Enhanced processing with smart logo sizing and comprehensive textbox handling.
+    logo_bytes: the logo file's contents, read once by the caller for a whole run;
+    otherwise it is read here once for the document.
     """
-    print(f"Processing: {input_path.name}")
+    logger.debug("Processing: %s", input_path.name)
     
     report = {
         "file": str(input_path),
@@ -1286,128 +1383,161 @@ def process_docx(input_path: Path, output_path: Path, repl: Dict[str, str], logo
         "xml_paras_pruned": 0,
     }
     
+    # Decided once; the cover logo step and the body loop both need it
+    is_policy = is_policy_manual(input_path)
+    # One stat per document: from here on `logo` is either an existing file or None
+    requested_logo = logo
+    if logo is not None and not logo.exists():
+        logo = None
+
+    # A document with nothing to replace, no cover logo due and no version control table to date
+    # is never loaded or re-saved: the streamed pre-scan decides and the file goes out as it came in
+    cover_logo_due = is_policy and logo is not None and not dry
+    if not cover_logo_due and not _may_need_processing(input_path, check_version_control=not dry):
+        logger.debug("Nothing to process in %s; left unchanged", input_path.name)
+        if not dry and output_path != input_path:
+            shutil.copyfile(input_path, output_path)
+        logger.info("Completed processing: %s", input_path.name)
+        logger.info("Summary: Body logos: 0, Headers logos: 0, Changed: False")
+        return report
+
     try:
-        doc = Document(str(input_path))
-        print(f"Document loaded successfully")
+        doc = _load_document(input_path)
+        logger.debug("Document loaded successfully")
     except Exception as e:
-        print(f"Failed to load document: {e}")
+        logger.warning("Failed to load document: %s", e)
         return report
 
+    # Compiled once per document and shared by every header/footer paragraph and table cell;
+    # <logo> is left out so the header pass can still see it
+    header_matcher = _literal_matcher(repl, include_logo=False)
+    # Every add_picture below gets a fresh BytesIO over these bytes instead of reopening the file
+    if logo is not None and logo_bytes is None and not dry:
+        logo_bytes = logo.read_bytes()
+
     # 1. Add cover logo for policy manuals (ENHANCED DEBUGGING)
     try:
-        print(f"=== COVER LOGO DEBUG START ===")
-        print(f"Document name: {input_path.name}")
-        print(f"Full path: {input_path}")
+        logger.debug("=== COVER LOGO DEBUG START ===")
+        logger.debug("Document name: %s", input_path.name)
+        logger.debug("Full path: %s", input_path)
         
-        is_policy = is_policy_manual(input_path)
-        print(f"Is policy manual: {is_policy}")
-        print(f"Logo provided: {logo is not None}")
-        print(f"Logo exists: {logo and logo.exists() if logo else False}")
-        print(f"Dry run: {dry}")
-        print(f"Width setting: {width_mm}mm")
+        logger.debug("Is policy manual: %s", is_policy)
+        logger.debug("Logo provided: %s", requested_logo is not None)
+        logger.debug("Logo exists: %s", logo is not None)
+        logger.debug("Dry run: %s", dry)
+        logger.debug("Width setting: %smm", width_mm)
         
         # CHECK ALL CONDITIONS
         if not is_policy:
-            print(f"SKIPPING: Not a policy manual")
-        elif not logo:
-            print(f"SKIPPING: No logo provided")
-        elif not logo.exists():
-            print(f"SKIPPING: Logo file doesn't exist at {logo}")
+            logger.debug("SKIPPING: Not a policy manual")
+        elif not requested_logo:
+            logger.debug("SKIPPING: No logo provided")
+        elif logo is None:
+            logger.debug("SKIPPING: Logo file doesn't exist at %s", requested_logo)
         elif dry:
-            print(f"SKIPPING: Dry run mode")
+            logger.debug("SKIPPING: Dry run mode")
         else:
-            print(f"ALL CONDITIONS MET - PROCEEDING WITH COVER LOGO")
+            logger.debug("ALL CONDITIONS MET - PROCEEDING WITH COVER LOGO")
             
             # Document state before
-            print(f"Document state BEFORE logo insertion:")
-            print(f"    - Paragraphs: {len(doc.paragraphs)}")
-            print(f"    - Tables: {len(doc.tables)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Document state BEFORE logo insertion:")
+                logger.debug("    - Paragraphs: %s", len(doc.paragraphs))
+                logger.debug("    - Tables: %s", len(doc.tables))
             
             # ATTEMPT INSERTION
-            if add_cover_page_logo_large(doc, logo, width_mm):
+            if add_cover_page_logo_large(doc, logo, width_mm, logo_bytes):
                 report["changed"] = True
-                print(f"COVER LOGO FUNCTION RETURNED TRUE")
+                logger.debug("COVER LOGO FUNCTION RETURNED TRUE")
                 
                 # Document state after
-                print(f"Document state AFTER logo insertion:")
-                print(f"    - Paragraphs: {len(doc.paragraphs)}")
-                print(f"    - Tables: {len(doc.tables)}")
-                if doc.paragraphs:
-                    print(f"    - First paragraph text: '{doc.paragraphs[0].text[:50]}...'")
+                if logger.isEnabledFor(logging.DEBUG):
+                    paragraphs = doc.paragraphs
+                    logger.debug("Document state AFTER logo insertion:")
+                    logger.debug("    - Paragraphs: %s", len(paragraphs))
+                    logger.debug("    - Tables: %s", len(doc.tables))
+                    if paragraphs:
+                        logger.debug("    - First paragraph text: '%s...'", paragraphs[0].text[:50])
             else:
-                print(f"COVER LOGO FUNCTION RETURNED FALSE")
+                logger.debug("COVER LOGO FUNCTION RETURNED FALSE")
         
-        print(f"=== COVER LOGO DEBUG END ===")
+        logger.debug("=== COVER LOGO DEBUG END ===")
             
     except Exception as cover_error:
-        print(f"Error in cover logo section: {cover_error}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("Error in cover logo section: %s", cover_error, exc_info=True)
 
     # 2. Process shape-based textboxes (ENHANCED - for cover page placeholders in shapes)
     try:
-        print(f"Processing shape-based textboxes...")
+        logger.debug("Processing shape-based textboxes...")
         shape_changed = process_shape_textboxes_enhanced(doc, repl)
         if shape_changed:
             report["changed"] = True
-            print(f"Shape textboxes processed successfully")
+            logger.debug("Shape textboxes processed successfully")
     except Exception as shape_error:
-        print(f"Error processing shape textboxes: {shape_error}")
+        logger.warning("Error processing shape textboxes: %s", shape_error)
 
     # 3. Process body paragraphs - PROTECT COVER LOGO PARAGRAPH
     try:
         paragraph_count = 0
-        is_policy = is_policy_manual(input_path)
-        
-        print(f"=== BODY PROCESSING DEBUG START ===")
-        print(f"Is policy manual: {is_policy}")
-        print(f"Total paragraphs: {len(doc.paragraphs)}")
-        
-        for i, p in enumerate(doc.paragraphs):
+        master = _build_master_pattern(repl)
+        
+        # The same top-level w:p children doc.paragraphs lists, walked on the lxml tree;
+        # a python-docx Paragraph is only built for the few that can hold a placeholder
+        body_elm = doc.element.body
+        body = doc._body
+        # Built before the loop; logos inserted below only land in the paragraph being processed
+        image_paras = _image_paragraphs(body_elm)
+        logger.debug("=== BODY PROCESSING DEBUG START ===")
+        logger.debug("Is policy manual: %s", is_policy)
+        
+        for i, p_elm in enumerate(body_elm.iterchildren(_W_P)):
             paragraph_count += 1
-            para_text = p.text[:100] if p.text else "[EMPTY]"
-            print(f"Processing paragraph {i}: '{para_text}...'")
+            # Prose without a '<' has nothing to replace; skip the per-run engine entirely
+            if not _element_may_hold_placeholder(p_elm):
+                continue
+            p = Paragraph(p_elm, body)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Processing paragraph %d: '%s...'", i, p.text[:100])
             
             # STRICT PROTECTION: Skip first paragraph for policy manuals
             if is_policy and i == 0:
-                print(f"PROTECTING first paragraph in policy manual (contains cover logo)")
+                logger.debug("PROTECTING first paragraph in policy manual (contains cover logo)")
                 continue
             
             # Also skip any paragraph that has images (safer protection)
-            has_image = hasattr(p, '_element') and _paragraph_contains_image(p._element)
-            if has_image:
-                print(f"PROTECTING paragraph {i} (contains images)")
+            if p_elm in image_paras:
+                logger.debug("PROTECTING paragraph %d (contains images)", i)
                 continue
             
             # Use the smart logo function for other paragraphs
-            chg, logo_ins, unres = process_par_safe_logo_smart(p, repl, logo=logo, width_mm=width_mm, dry=dry)
+            chg, logo_ins, unres = process_par_safe_logo_smart(p, repl, logo=logo, width_mm=width_mm, dry=dry, master=master, logo_bytes=logo_bytes)
             if chg:
                 report["changed"] = True
-                print(f"Paragraph {i} changed")
+                logger.debug("Paragraph %d changed", i)
             if logo_ins:
                 report["logos_inserted_body"] += logo_ins
-                print(f"Logo inserted in paragraph {i}")
+                logger.debug("Logo inserted in paragraph %d", i)
             report["placeholders_missing"].update(unres)
         
-        print(f"Processed {paragraph_count} paragraphs (protected: {1 if is_policy else 0})")
-        print(f"=== BODY PROCESSING DEBUG END ===")
+        logger.debug("Processed %d paragraphs (protected: %d)", paragraph_count, 1 if is_policy else 0)
+        logger.debug("=== BODY PROCESSING DEBUG END ===")
         
     except Exception as process_error:
-        print(f"Error during body processing: {process_error}")
+        logger.warning("Error during body processing: %s", process_error)
 
     # 4. Process headers and footers (ORIGINAL SAFE METHOD - no alignment changes)
     try:
-        # Use smaller size for headers (cap at 20mm) - separate from cover logos
-        header_width = min(width_mm, 20.0)  # Cap at 20mm for headers only
-        print(f"Header logo size: {header_width}mm (capped at 20mm for headers)")
+        # Use smaller size for headers - separate from cover logos; worked out once per document
+        header_width = min(width_mm, _HEADER_LOGO_MAX_MM)
+        logger.debug("Header logo size: %smm (capped at %smm for headers)", header_width, _HEADER_LOGO_MAX_MM)
         
-        hf_changed, hf_logos = process_headers_and_footers_original_safe(doc, repl, logo, header_width, dry)
+        hf_changed, hf_logos = process_headers_and_footers_original_safe(doc, repl, logo, header_width, dry, header_matcher, logo_bytes)
         if hf_changed:
             report["changed"] = True
         report["logos_inserted_headers"] = hf_logos
         
     except Exception as hf_error:
-        print(f"Error processing headers/footers: {hf_error}")
+        logger.warning("Error processing headers/footers: %s", hf_error)
 
     # 5. Shapes + XML pruning (ultra image protected)
     try:
@@ -1418,7 +1548,7 @@ def process_docx(input_path: Path, output_path: Path, repl: Dict[str, str], logo
         if xml_changed or xml_logo or pruned:
             report["changed"] = True
     except Exception as xml_error:
-        print(f"Error during XML processing: {xml_error}")
+        logger.warning("Error during XML processing: %s", xml_error)
 
     # 6. Shapes in headers/footers
     try:
@@ -1428,22 +1558,22 @@ def process_docx(input_path: Path, output_path: Path, repl: Dict[str, str], logo
         if hx_changed or hx_logo:
             report["changed"] = True
     except Exception as hx_error:
-        print(f"Error processing header/footer shapes: {hx_error}")
+        logger.warning("Error processing header/footer shapes: %s", hx_error)
 
     # 7. Process version control table
     try:
         if not dry:
-            print(f"Processing version control table...")
+            logger.debug("Processing version control table...")
             version_processed = process_version_control_table(doc)
             if version_processed:
                 report["version_control_processed"] = 1
                 report["changed"] = True
-                print(f"Version control table processed successfully")
+                logger.debug("Version control table processed successfully")
             else:
-                print(f"No version control table found or updated")
+                logger.debug("No version control table found or updated")
         
     except Exception as vc_error:
-        print(f"Error processing version control table: {vc_error}")
+        logger.warning("Error processing version control table: %s", vc_error)
 
     # 8. Fallback logo if only in shapes
     if (report["xml_logo_hits"] > 0) and (report["logos_inserted_body"] + report["logos_inserted_headers"] == 0):
@@ -1453,8 +1583,8 @@ def process_docx(input_path: Path, output_path: Path, repl: Dict[str, str], logo
                 # Set right alignment for fallback logo too
                 first_p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
                 run = first_p.add_run()
-                run.add_picture(str(logo), width=Mm(width_mm))
-                print(f"Fallback logo inserted and right-aligned")
+                run.add_picture(_logo_source(logo, logo_bytes), width=Mm(width_mm))
+                logger.debug("Fallback logo inserted and right-aligned")
                 report["logos_inserted_body"] += 1
                 report["changed"] = True
             except Exception:
@@ -1464,16 +1594,13 @@ def process_docx(input_path: Path, output_path: Path, repl: Dict[str, str], logo
     if not dry:
         try:
             doc.save(str(output_path))
-            print(f"Document saved successfully")
+            logger.debug("Document saved successfully")
         except Exception as save_error:
-            print(f"Failed to save document: {save_error}")
+            logger.warning("Failed to save document: %s", save_error)
             return report
 
-    report["placeholders_found"] = sorted(report["placeholders_found"])
-    report["placeholders_missing"] = sorted(report["placeholders_missing"])
-    
-    print(f"Completed processing: {input_path.name}")
-    print(f"Summary: Body logos: {report['logos_inserted_body']}, Headers logos: {report['logos_inserted_headers']}, Changed: {report['changed']}")
+    logger.info("Completed processing: %s", input_path.name)
+    logger.info("Summary: Body logos: %s, Headers logos: %s, Changed: %s", report['logos_inserted_body'], report['logos_inserted_headers'], report['changed'])
     
     return report
 
@@ -1481,88 +1608,210 @@ def process_docx(input_path: Path, output_path: Path, repl: Dict[str, str], logo
 # FILE MANAGEMENT FUNCTIONS
 # ============================================================================
 
-def expand_master(master_src: Path, work: Path) -> Path:
-    work.mkdir(parents=True, exist_ok=True)
-    dst = work / "Master_Expanded"
-    if dst.exists():
-        shutil.rmtree(dst)
+def _is_selected(name: str, is_dir: bool, wanted: Optional[List[str]]) -> bool:
+    """Whether a top-level master entry is copied: every entry without a filter, else matching service folders"""
+    if wanted is None:
+        return True
+    # Loose top-level files belong to no service folder, so only an unfiltered copy takes them
+    return is_dir and any(w in name.lower() for w in wanted)
+
+def expand_master(master_src: Path, dest_root: Path, services: Optional[List[str]] = None, incremental: bool = False) -> Path:
+    """
+    Copy (folder) or extract (zip) the selected service folders of the master straight into dest_root.
+    incremental: for a folder master, keep what dest_root already holds and only copy files that
+    changed (see sync_selected); a zip is always extracted in full.
+    """
     if master_src.is_dir():
-        shutil.copytree(master_src, dst)
+        if incremental:
+            sync_selected(master_src, dest_root, services)
+        else:
+            copy_selected(master_src, dest_root, services)
     elif master_src.suffix.lower() == ".zip":
+        dest_root.mkdir(parents=True, exist_ok=True)
+        wanted = [s.lower() for s in services] if services else None
         with zipfile.ZipFile(master_src, "r") as zf:
-            zf.extractall(dst)
+            members = []
+            for info in zf.infolist():
+                top, sep, _rest = info.filename.partition("/")
+                if _is_selected(top, bool(sep), wanted):
+                    members.append(info)
+            zf.extractall(dest_root, members=members)
     else:
         raise ValueError("Master must be a folder or .zip")
-    return dst
+    return dest_root
 
 def copy_selected(master_root: Path, dest_root: Path, services: Optional[List[str]]):
     dest_root.mkdir(parents=True, exist_ok=True)
     wanted = [s.lower() for s in services] if services else None
     for item in master_root.iterdir():
-        if item.is_dir() and ((wanted is None) or any(w in item.name.lower() for w in wanted)):
-            shutil.copytree(item, dest_root / item.name, dirs_exist_ok=True)
-        elif item.is_file() and (wanted is None or any(w in item.parent.name.lower() for w in wanted)):
+        if item.is_dir():
+            if _is_selected(item.name, True, wanted):
+                shutil.copytree(item, dest_root / item.name, dirs_exist_ok=True)
+        elif item.is_file() and _is_selected(item.name, False, wanted):
             shutil.copy2(item, dest_root / item.name)
 
 def walk_docx(root: Path):
     """Walk through directory and find .docx files, excluding temporary files"""
-    for p in root.rglob("*.docx"):
-        # Skip temporary Word files (start with ~$)
-        if p.name.startswith("~$"):
-            print(f"Skipping temporary file: {p.name}")
-            continue
-        # Skip hidden files
-        if p.name.startswith("."):
-            print(f"Skipping hidden file: {p.name}")
+    # Explicit os.scandir stack: dirent types come cached from the listing, no Path per entry.
+    # Same order as os.walk: a folder's files first, then its subfolders depth-first in listing
+    # order; directory symlinks are not followed and unreadable folders are skipped
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
             continue
-        yield p
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if not entry.is_symlink():
+                    subdirs.append(entry.path)
+                continue
+            # normcase lowers on Windows only, as rglob("*.docx") matched there
+            if not os.path.normcase(name).endswith(".docx"):
+                continue
+            # Skip temporary Word files (start with ~$)
+            if name.startswith("~$"):
+                logger.debug("Skipping temporary file: %s", name)
+                continue
+            # Skip hidden files
+            if name.startswith("."):
+                logger.debug("Skipping hidden file: %s", name)
+                continue
+            yield Path(entry.path)
+        stack.extend(reversed(subdirs))
+
+def _copy_if_changed(src: Path, dst: Path) -> bool:
+    """copy2 unless dst already has src's size and mtime (copy2 carries the mtime over)"""
+    try:
+        s, d = src.stat(), dst.stat()
+        if s.st_size == d.st_size and s.st_mtime_ns == d.st_mtime_ns:
+            return False
+    except FileNotFoundError:
+        pass
+    shutil.copy2(src, dst)
+    return True
 
-def run_pipeline(master_src: Path, out_dir: Path, data_json: Path, logo: Optional[Path] = None, services_csv: Optional[str] = None, dry_run: bool = False, logo_width_mm: float = 35.0):
-    print(f"\nENHANCED PIPELINE STARTED")
-    print(f"Logo width received: {logo_width_mm}mm (type: {type(logo_width_mm)})")
-    print(f"Master: {master_src}")
-    print(f"Output: {out_dir}")
-    print(f"Logo: {logo}")
-    print(f"Dry run: {dry_run}")
+def sync_selected(master_root: Path, dest_root: Path, services: Optional[List[str]]):
+    """
+    Incremental copy_selected: files whose size and mtime already match are left alone,
+    files and folders that are no longer selected are removed. Documents processed in place always
+    differ from their source afterwards, so they are copied again on every run.
+    """
+    dest_root.mkdir(parents=True, exist_ok=True)
+    wanted = [s.lower() for s in services] if services else None
+    keep: Set[Path] = set()
+    keep_dirs: Set[Path] = set()
+    copied = 0
+    for item in master_root.iterdir():
+        if item.is_dir():
+            if not _is_selected(item.name, True, wanted):
+                continue
+            # followlinks like copytree, which copies what symlinked folders point at
+            for dirpath, _dirnames, filenames in os.walk(item, followlinks=True):
+                rel_dir = Path(dirpath).relative_to(master_root)
+                (dest_root / rel_dir).mkdir(parents=True, exist_ok=True)
+                keep_dirs.add(rel_dir)
+                for name in filenames:
+                    keep.add(rel_dir / name)
+                    copied += _copy_if_changed(Path(dirpath) / name, dest_root / rel_dir / name)
+        elif item.is_file() and _is_selected(item.name, False, wanted):
+            keep.add(Path(item.name))
+            copied += _copy_if_changed(item, dest_root / item.name)
+    removed = 0
+    # Bottom-up, so a folder is already emptied of stale files when it is reached
+    for dirpath, _dirnames, filenames in os.walk(dest_root, topdown=False):
+        rel_dir = Path(dirpath).relative_to(dest_root)
+        for name in filenames:
+            if rel_dir / name not in keep:
+                os.remove(os.path.join(dirpath, name))
+                removed += 1
+        # Kept files only sit in kept folders, so anything else is empty by now
+        if rel_dir != Path(".") and rel_dir not in keep_dirs:
+            os.rmdir(dirpath)
+    logger.info("Incremental copy: %d copied, %d unchanged, %d removed", copied, len(keep) - copied, removed)
+
+# Set once per worker process by _init_worker: process_docx keyword arguments shared by every document
+_WORKER_JOB: Optional[dict] = None
+
+def _init_worker(log_level: int, job: dict):
+    # Spawned workers do not inherit the parent's logging setup
+    logging.basicConfig(level=log_level, format="%(message)s")
+    # repl and the logo bytes cross the process boundary here, once, not with every task
+    global _WORKER_JOB
+    _WORKER_JOB = job
+
+def _process_in_worker(docx_path: Path):
+    """Pool task: only the path is sent; the document is edited in place"""
+    return process_docx(docx_path, docx_path, **_WORKER_JOB)
+
+def run_pipeline(master_src: Path, out_dir: Path, data_json: Path, logo: Optional[Path] = None, services_csv: Optional[str] = None, dry_run: bool = False, logo_width_mm: float = 35.0, jobs: int = 1, incremental: bool = False):
+    """
+    jobs: worker processes for the per-document step; 1 keeps everything in this
+    process (the default, and what the Streamlit app uses), 0 means one per CPU.
+    incremental: reuse out_dir from the previous run and only copy master files that
+    changed, instead of deleting and re-copying it (folder masters only).
+    """
+    logger.info("ENHANCED PIPELINE STARTED")
+    logger.debug("Logo width received: %smm (type: %s)", logo_width_mm, type(logo_width_mm))
+    logger.info("Master: %s", master_src)
+    logger.info("Output: %s", out_dir)
+    logger.info("Logo: %s", logo)
+    logger.info("Dry run: %s", dry_run)
     
     repl = load_replacements(data_json)
 
-    workspace = out_dir.parent / "_work"
-    if workspace.exists():
-        shutil.rmtree(workspace)
-    workspace.mkdir(parents=True, exist_ok=True)
-
-    master_dir = expand_master(master_src, workspace)
-
-    staged = workspace / "staged_client"
-    if staged.exists():
-        shutil.rmtree(staged)
-    staged.mkdir(parents=True, exist_ok=True)
+    # One filtered copy/extract of the master straight into the output; documents are edited in place
     services = [s.strip() for s in services_csv.split(",")] if services_csv else None
-    copy_selected(master_dir, staged, services)
-
-    if out_dir.exists():
+    if out_dir.exists() and not (incremental and master_src.is_dir()):
         shutil.rmtree(out_dir)
-    shutil.copytree(staged, out_dir)
-
-    reports = []
-    for docx_path in walk_docx(out_dir):
-        print(f"\nProcessing: {docx_path.name}")
-        print(f"Using logo width: {logo_width_mm}mm")
-        rep = process_docx(docx_path, docx_path, repl, logo=logo if logo and Path(logo).exists() else None, width_mm=logo_width_mm, dry=dry_run)
-        reports.append(rep)
+    expand_master(master_src, out_dir, services, incremental=incremental)
+
+    docx_paths = list(walk_docx(out_dir))
+    # Resolved once for the run; process_docx re-checks it once per document, not per insertion
+    logo_path = Path(logo) if logo else None
+    if logo_path is not None and not logo_path.exists():
+        logo_path = None
+    # Read once per run; each document wraps the same bytes instead of reopening the file
+    logo_bytes = logo_path.read_bytes() if logo_path is not None and not dry_run else None
+    # Documents are independent once repl is loaded; everything here pickles for the workers
+    job = dict(repl=repl, logo=logo_path, width_mm=logo_width_mm, dry=dry_run, logo_bytes=logo_bytes)
+    workers = min(jobs if jobs > 0 else (os.cpu_count() or 1), len(docx_paths))
+    logger.info("Using logo width: %smm", logo_width_mm)
 
     report_path = out_dir.parent / ("dry_run_report.csv" if dry_run else "run_report.csv")
+    # Rows are written as each document finishes; no list of reports is kept
     with open(report_path, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
         w.writerow(["file","output","changed","logos_inserted_body","logos_inserted_headers","version_control_processed","xml_logo_hits","xml_paras_changed","xml_paras_pruned","placeholders_found","placeholders_missing"])
-        for r in reports:
+
+        def write_row(r):
             w.writerow([
                 r["file"], r["output"], r["changed"],
                 r["logos_inserted_body"], r["logos_inserted_headers"], r["version_control_processed"],
                 r["xml_logo_hits"], r["xml_paras_changed"], r["xml_paras_pruned"],
-                "; ".join(r["placeholders_found"]), "; ".join(r["placeholders_missing"]),
+                # process_docx hands back sets; they are ordered only here
+                "; ".join(sorted(r["placeholders_found"])), "; ".join(sorted(r["placeholders_missing"])),
             ])
+
+        if workers <= 1:
+            for docx_path in docx_paths:
+                logger.info("Processing: %s", docx_path.name)
+                write_row(process_docx(docx_path, docx_path, **job))
+        else:
+            logger.info("Processing %d documents with %d worker processes", len(docx_paths), workers)
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(logging.getLogger().getEffectiveLevel(), job)
+            ) as ex:
+                # map() yields in walk order as results arrive, so the rows match a serial run
+                for r in ex.map(_process_in_worker, docx_paths):
+                    write_row(r)
     return report_path
 
 def main():
@@ -1574,14 +1823,20 @@ def main():
     ap.add_argument("--services")
     ap.add_argument("--dry-run", action="store_true")
     ap.add_argument("--logo-width-mm", type=float, default=35.0, help="Logo width in millimeters")
+    ap.add_argument("--jobs", type=int, default=1, help="Worker processes for the documents (1 = serial, the default; 0 = one per CPU)")
+    ap.add_argument("--quiet", action="store_true", help="Only log errors")
+    ap.add_argument("--incremental", action="store_true", help="Keep the previous output and only copy master files that changed (folder masters)")
+    ap.add_argument("--verbose", action="store_true", help="Log every step, paragraph and shape (debug output)")
     args = ap.parse_args()
+    level = logging.DEBUG if args.verbose else logging.ERROR if args.quiet else logging.WARNING
+    logging.basicConfig(level=level, format="%(message)s")
 
     master = Path(args.master)
     out_dir = Path(args.out)
     data = Path(args.client)
     logo = Path(args.logo) if args.logo else None
 
-    report = run_pipeline(master, out_dir, data, logo=logo, services_csv=args.services, dry_run=args.dry_run, logo_width_mm=args.logo_width_mm)
+    report = run_pipeline(master, out_dir, data, logo=logo, services_csv=args.services, dry_run=args.dry_run, logo_width_mm=args.logo_width_mm, jobs=args.jobs, incremental=args.incremental)
     print(f"Report: {report}")
 
 if __name__ == "__main__":